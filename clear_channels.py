@@ -1,8 +1,21 @@
-import csv
+import argparse
+import json
+import os
+import sys
 
-file_path = r"C:\Users\USER\Desktop\TELE_BOT_UP_ENV\channels.csv"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from flagged_store import connect
 
-with open(file_path, 'w', newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerow(["Channel ID", "Name", "Username", "Members"]) 
-print(f"Flagged messages file at '{file_path}' has been cleared.")
+parser = argparse.ArgumentParser(description="Clear the discovered channels from the database.")
+parser.add_argument("--all", action="store_true", help="Also forget the monitored channels.")
+args = parser.parse_args()
+
+with open("config.json", "r") as config_file:
+    db_path = json.load(config_file).get("settings", {}).get("db_path", "flagged_messages.db")
+
+connection = connect(db_path)
+with connection:
+    where = "" if args.all else " WHERE monitored = 0"
+    deleted = connection.execute(f"DELETE FROM channels{where}").rowcount
+connection.close()
+print(f"Cleared {deleted} {'' if args.all else 'unmonitored '}channels from '{db_path}'.")
@@ -1,8 +1,16 @@
-import csv
+import json
+import os
+import sys
 
-file_path = r"C:\Users\USER\Desktop\TELE_BOT_UP_ENV\flagged_messages.csv"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from flagged_store import connect
 
-with open(file_path, 'w', newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerow(["Channel Name", "Message", "Risk Score", "Flags", "Explanations"]) 
-print(f"Flagged messages file at '{file_path}' has been cleared.")
+with open("config.json", "r") as config_file:
+    db_path = json.load(config_file).get("settings", {}).get("db_path", "flagged_messages.db")
+
+connection = connect(db_path)
+with connection:
+    deleted = connection.execute("DELETE FROM flagged_messages").rowcount
+connection.execute("VACUUM")
+connection.close()
+print(f"Cleared {deleted} flagged messages from '{db_path}'.")
@@ -53,6 +53,7 @@ setup(
     install_requires=[
         "telethon==1.24.0",
         "requests==2.28.1",
+        "aiohttp==3.8.4",
         "easyocr==1.6.2",
         "langid==1.1.6",
         "googletrans==4.0.0-rc1",
@@ -64,6 +65,8 @@ setup(
         "huggingface-hub==0.11.1",
         "numpy==1.24.3",
         "scikit-image==0.20.0",
+        "Pillow==9.5.0",
+        "pyarrow==12.0.1",
     ],
     classifiers=[
         "Programming Language :: Python :: 3",
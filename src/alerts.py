@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import aiohttp
+
+from metrics import alert_seconds, alert_failures
+
+
+class AlertDispatcher:
+    """
+    Sends admin alerts from a background task.
+
+    Alerts are queued without blocking the message handlers. Alerts already
+    queued when a send starts are sent together; with a `digest_window`
+    above 0, the dispatcher also waits that many seconds after the first
+    alert for more, which delays every alert by up to the window. Coalesced
+    alerts are grouped: copies of the same text
+    posted to several channels become one campaign digest, and several alerts
+    from one channel become one channel digest. Sends are spaced at least
+    `min_interval` seconds apart and honour the Bot API's retry_after.
+    config.json is read once and re-read only when its mtime changes.
+    """
+
+    def __init__(self, format_alert, config_path="config.json", queue_size=1000,
+                 digest_window=0.0, max_digest_items=10, min_interval=1.0, max_retries=3,
+                 api_base="https://api.telegram.org"):
+        self.format_alert = format_alert
+        self.api_base = api_base
+        self.config_path = config_path
+        self.digest_window = digest_window
+        self.max_digest_items = max_digest_items
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._config_mtime = None
+        self.bot_token = None
+        self.admin_chat_id = None
+        self._session = None
+        self._task = None
+        self._last_send = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def load_config_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.config_path)
+            if mtime == self._config_mtime:
+                return
+            with open(self.config_path, "r") as config_file:
+                config = json.load(config_file)
+            self._config_mtime = mtime
+            self.bot_token = config.get("TELEGRAM_BOT_TOKEN")
+            self.admin_chat_id = config.get(
+                "ADMIN_CHAT_ID", config.get("telegram_api", {}).get("admin_chat_id", "your_admin_chat_id_here")
+            )
+        except Exception as e:
+            print(f"Error loading alert configuration: {e}")
+
+    def start(self):
+        if self._task is None:
+            self.load_config_if_changed()
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=10):
+        """
+        Sends what is still queued (up to `timeout` seconds), then closes the session.
+        """
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Dropping {self._queue.qsize()} unsent alerts on shutdown.")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def submit(self, channel_name, message_text, risk_score, flags):
+        """
+        Queues an alert; drops it if the queue is full.
+        """
+        try:
+            self._queue.put_nowait((channel_name, message_text, risk_score, flags))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            alert_failures.inc()
+            print("Alert queue is full, dropping alert.")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            alerts = [await self._queue.get()]
+            deadline = loop.time() + self.digest_window
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    alerts.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while not self._queue.empty():
+                alerts.append(self._queue.get_nowait())
+            try:
+                self.load_config_if_changed()
+                for text in self._compose(alerts):
+                    await self._send(text)
+            except Exception as e:
+                print(f"Error sending real-time alert: {e}")
+            finally:
+                for _ in alerts:
+                    self._queue.task_done()
+
+    def _compose(self, alerts):
+        """
+        Turns a window of alerts into messages: campaign digests first, then
+        per-channel digests, then single alerts.
+        """
+        campaigns = {}
+        for alert in alerts:
+            key = hashlib.blake2b(" ".join(alert[1].lower().split()).encode("utf-8"), digest_size=8).digest()
+            campaigns.setdefault(key, []).append(alert)
+
+        messages = []
+        by_channel = {}
+        for group in campaigns.values():
+            channels = sorted({alert[0] for alert in group})
+            if len(channels) > 1:
+                _, message_text, risk_score, flags = max(group, key=lambda alert: alert[2])
+                messages.append(
+                    f"{self.format_alert(channels[0], message_text, risk_score, flags)}\n"
+                    f"Campaign: posted {len(group)} times in {len(channels)} channels: "
+                    f"{', '.join(channels[:self.max_digest_items])}"
+                )
+            else:
+                by_channel.setdefault(channels[0], []).append(max(group, key=lambda alert: alert[2]))
+
+        for channel_name, group in by_channel.items():
+            if len(group) == 1:
+                messages.append(self.format_alert(*group[0]))
+                continue
+            lines = [f"🚨 *{len(group)} High-Risk Messages Detected* 🚨", f"Channel: {channel_name}"]
+            for _, message_text, risk_score, flags in sorted(group, key=lambda alert: -alert[2])[:self.max_digest_items]:
+                preview = message_text if len(message_text) <= 200 else message_text[:200] + "..."
+                lines.append(f"- [{risk_score:.2f}] {flags}: {preview}")
+            if len(group) > self.max_digest_items:
+                lines.append(f"...and {len(group) - self.max_digest_items} more.")
+            messages.append("\n".join(lines))
+        self.coalesced += len(alerts) - len(messages)
+        return messages
+
+    async def _send(self, text):
+        url = f"{self.api_base}/bot{self.bot_token}/sendMessage"
+        payload = {"chat_id": self.admin_chat_id, "text": text, "parse_mode": "Markdown"}
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_send + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_send = time.monotonic()
+            started = time.perf_counter()
+            try:
+                async with self._session.post(url, json=payload) as response:
+                    data = await response.json(content_type=None)
+                    alert_seconds.observe(time.perf_counter() - started)
+                    if response.status == 200:
+                        self.sent += 1
+                        print("Real-time alert sent successfully.")
+                        return True
+                    if response.status == 429:
+                        retry_after = data.get("parameters", {}).get("retry_after", 2 ** attempt)
+                        print(f"Alert rate limited, retrying in {retry_after}s.")
+                        await asyncio.sleep(retry_after)
+                        continue
+                    if response.status == 400 and "parse_mode" in payload:
+                        payload.pop("parse_mode")
+                        continue
+                    print(f"Failed to send alert: {data}")
+                    break
+            except Exception as e:
+                print(f"Error sending real-time alert: {e}")
+                await asyncio.sleep(2 ** attempt)
+        alert_failures.inc()
+        return False
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
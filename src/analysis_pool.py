@@ -0,0 +1,96 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+_analyze_message = None
+_stage_seconds = []
+
+
+def _init_worker():
+    """
+    Runs once in each worker process: imports the detection module and loads
+    the models into that process.
+    """
+    global _analyze_message
+    from scam_detection import analyze_message, set_stage_observer, MULTILINGUAL
+    from model_registry import registry
+    set_stage_observer(lambda stage, seconds: _stage_seconds.append((stage, seconds)))
+    names = ["prefilter", "sentiment", "embedding", "phrase_store", "scam_index"]
+    if MULTILINGUAL:
+        names += ["multilingual_sentiment", "multilingual_embedding", "multilingual_phrase_store"]
+    for name in names:
+        registry.get(name)
+    _analyze_message = analyze_message
+
+
+def _analyze_in_worker(message_text, kwargs):
+    details = {}
+    _stage_seconds.clear()
+    result = _analyze_message(message_text, details=details, **kwargs)
+    details["stage_seconds"] = list(_stage_seconds)
+    return result, details
+
+
+class AnalysisExecutor:
+    """
+    Runs analyze_message in a pool of worker processes so inference and
+    blocking lookups never run on the Telethon event loop.
+
+    At most `max_in_flight` messages are submitted at once; further callers
+    wait on a semaphore until a slot frees up, which applies backpressure to
+    the handlers instead of growing an unbounded backlog inside the pool.
+    """
+
+    def __init__(self, workers=None, max_in_flight=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 4
+        self.in_flight = 0
+        self._pool = None
+        self._semaphore = None
+
+    def start(self):
+        """
+        Spawns the worker processes.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def analyze(self, message_text, details=None, **kwargs):
+        """
+        Analyzes a message in the pool, waiting for a free slot if saturated.
+        Keyword arguments are passed through to analyze_message, and the
+        details it records in the worker are copied into `details`, plus
+        the worker's `(stage, seconds)` timings under "stage_seconds".
+        """
+        if self._pool is None:
+            self.start()
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                result, worker_details = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, _analyze_in_worker, message_text, kwargs
+                )
+            finally:
+                self.in_flight -= 1
+        if details is not None:
+            details.update(worker_details)
+        return result
+
+    def saturated(self):
+        return self._semaphore is not None and self._semaphore.locked()
+
+    async def shutdown(self):
+        """
+        Drops queued work and waits for the workers to exit.
+        """
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: pool.shutdown(wait=True, cancel_futures=True)
+            )
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import time
+
+from telethon import functions
+from telethon.errors import FloodWaitError
+from telethon.errors.rpcerrorlist import ChatAdminRequiredError
+
+
+class BackfillScheduler:
+    """
+    Pages through the history of many channels concurrently.
+
+    Each channel is paged newest-first with `offset_id` until `max_messages`
+    are read or the last checkpointed message id is reached, so restarts only
+    fetch what was posted since the previous run. When `max_messages` runs
+    out first, the unread ids since the previous run are checkpointed as a
+    gap and read on the following runs, after the newest messages. At most `concurrency`
+    channels are fetched at once, and a FloodWaitError pauses every worker
+    for the requested time before the request is retried.
+    """
+
+    def __init__(self, client, handle_messages, checkpoint_path="backfill_checkpoint.json",
+                 concurrency=8, page_size=100, max_messages=1000, max_retries=5):
+        self.client = client
+        self.handle_messages = handle_messages
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.max_messages = max_messages
+        self.max_retries = max_retries
+        self.checkpoints = self.load_checkpoints()
+        self._flood_until = 0.0
+        self._semaphore = None
+
+    def load_checkpoints(self):
+        """
+        Returns `{"newest": id, "gaps": [[low, high], ...]}` per channel from
+        the checkpoint file: the newest message id read and the ranges of
+        older ids still unread.
+        """
+        if not self.checkpoint_path or not os.path.isfile(self.checkpoint_path):
+            return {}
+        try:
+            with open(self.checkpoint_path, "r") as checkpoint_file:
+                return {
+                    str(k): {"newest": int(v), "gaps": []} if isinstance(v, int) else
+                    {"newest": int(v["newest"]), "gaps": [[int(low), int(high)] for low, high in v.get("gaps", [])]}
+                    for k, v in json.load(checkpoint_file).items()
+                }
+        except Exception as e:
+            print(f"Error loading backfill checkpoints: {e}")
+            return {}
+
+    def save_checkpoints(self):
+        if not self.checkpoint_path:
+            return
+        try:
+            temp_path = f"{self.checkpoint_path}.tmp"
+            with open(temp_path, "w") as checkpoint_file:
+                json.dump(self.checkpoints, checkpoint_file)
+            os.replace(temp_path, self.checkpoint_path)
+        except Exception as e:
+            print(f"Error saving backfill checkpoints: {e}")
+
+    async def run(self, channel_ids):
+        """
+        Backfills all channels and returns the number of messages read.
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        counts = await asyncio.gather(*(self._run_channel(channel_id) for channel_id in channel_ids))
+        return sum(counts)
+
+    async def _run_channel(self, channel_id):
+        async with self._semaphore:
+            try:
+                return await self.backfill_channel(channel_id)
+            except ChatAdminRequiredError:
+                print(f"Cannot fetch messages from channel {channel_id}: Admin rights required.")
+            except Exception as e:
+                print(f"Error fetching messages from channel {channel_id}: {e}")
+            return 0
+
+    async def backfill_channel(self, channel_id):
+        """
+        Reads new history of one channel page by page, handing each page to
+        `handle_messages(channel_id, messages)`, then fills the gaps left by
+        earlier runs while `max_messages` allows.
+        """
+        checkpoint = self.checkpoints.get(str(channel_id), {"newest": 0, "gaps": []})
+        # A high of 0 pages down from the newest message.
+        ranges = [[checkpoint["newest"], 0]] + checkpoint["gaps"]
+        newest_id = checkpoint["newest"]
+        gaps = []
+        fetched = 0
+
+        for low, high in ranges:
+            if fetched >= self.max_messages:
+                gaps.append([low, high])
+                continue
+            read, newest, oldest = await self._read_range(channel_id, low, high, self.max_messages - fetched)
+            fetched += read
+            newest_id = max(newest_id, newest)
+            # Without a checkpoint there is no gap: the first run only
+            # reads the newest `max_messages`.
+            if oldest is not None and low:
+                gaps.append([low, oldest])
+
+        gaps = [[low, high] for low, high in gaps if high - low > 1]
+        if newest_id == checkpoint["newest"] and gaps == checkpoint["gaps"]:
+            return fetched
+        self.checkpoints[str(channel_id)] = {"newest": newest_id, "gaps": gaps}
+        self.save_checkpoints()
+        return fetched
+
+    async def _read_range(self, channel_id, low, high, budget):
+        """
+        Pages through the messages with `low < id < high` (no upper bound
+        when `high` is 0), reading at most `budget`. Returns `(read, newest
+        id read, oldest id read or None once `low` was reached)`.
+        """
+        offset_id = high
+        newest_id = 0
+        fetched = 0
+
+        while fetched < budget:
+            limit = min(self.page_size, budget - fetched)
+            history = await self._request(functions.messages.GetHistoryRequest(
+                peer=channel_id,
+                offset_id=offset_id,
+                offset_date=None,
+                add_offset=0,
+                limit=limit,
+                max_id=0,
+                min_id=low,
+                hash=0
+            ))
+            messages = [m for m in history.messages if m.id > low]
+            if not messages:
+                return fetched, newest_id, None
+            newest_id = max(newest_id, max(m.id for m in messages))
+            fetched += len(messages)
+            await self.handle_messages(channel_id, messages)
+            offset_id = min(m.id for m in messages)
+            if len(history.messages) < limit:
+                return fetched, newest_id, None
+        return fetched, newest_id, offset_id
+
+    async def _request(self, request):
+        for attempt in range(self.max_retries + 1):
+            delay = self._flood_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await self.client(request)
+            except FloodWaitError as e:
+                if attempt == self.max_retries:
+                    raise
+                wait = e.seconds + min(2 ** attempt, 60)
+                print(f"Flood wait of {e.seconds}s while backfilling, retrying in {wait}s.")
+                self._flood_until = max(self._flood_until, time.monotonic() + wait)
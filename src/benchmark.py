@@ -0,0 +1,192 @@
+import argparse
+import csv
+import json
+import platform
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import scam_detection
+from indicators import base58check_encode
+from model_registry import registry
+
+BENIGN_TEMPLATES = [
+    "Bitcoin is trading sideways around {price} today, volume is {adjective}.",
+    "Weekly market recap: {coin} closed at {price}, funding rates look {adjective}.",
+    "Reminder: never share your seed phrase with anyone, admins will not DM you.",
+    "New article on {coin} layer-2 scaling is up on our blog: {url}",
+    "Can anyone recommend a hardware wallet that supports {coin}?",
+]
+
+SCAM_TEMPLATES = [
+    "{keyword}! Send {coin} to {wallet} and receive double back within 24 hours.",
+    "Exclusive {keyword} for our members only, register now at {url}",
+    "Our trusted platform offers {keyword}, minimum deposit 0.1 {coin}. DM admin.",
+    "Last chance: {keyword}. Withdrawal problems? Contact support at {url}",
+]
+
+
+def synthetic_corpus(size, scam_ratio=0.3, seed=7):
+    """
+    Generates a reproducible mix of benign and scam-like messages.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        fields = {
+            "coin": rng.choice(["BTC", "ETH", "USDT", "SOL"]),
+            "price": f"${rng.randint(1000, 70000):,}",
+            "adjective": rng.choice(["thin", "healthy", "elevated", "quiet"]),
+            "keyword": rng.choice(scam_detection.SCAM_KEYWORDS),
+            "url": f"https://{rng.choice(['claim', 'promo', 'news', 'airdrop'])}-{rng.randint(1, 999)}.example.com/x",
+            # A random 20-byte hash as a legacy Bitcoin address, checksum included.
+            "wallet": base58check_encode(b"\x00" + rng.randbytes(20)),
+        }
+        templates = SCAM_TEMPLATES if rng.random() < scam_ratio else BENIGN_TEMPLATES
+        corpus.append(rng.choice(templates).format(**fields))
+    return corpus
+
+
+def load_corpus(path):
+    """
+    Loads messages from a .txt file (one per line) or a CSV with a
+    "Message Text" column, such as the flagged message export.
+    """
+    with open(path, "r", encoding="utf-8") as corpus_file:
+        if path.endswith(".csv"):
+            return [row["Message Text"] for row in csv.DictReader(corpus_file) if row.get("Message Text")]
+        return [line.strip() for line in corpus_file if line.strip()]
+
+
+def stub_network(latency_ms=0.0):
+    """
+    Replaces the URL and wallet lookups with local stubs that return a clean
+    verdict after an optional simulated latency.
+    """
+    def stub(_):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return False
+
+    scam_detection.inspect_url = stub
+    scam_detection.check_wallet_address = stub
+
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q) * 1000) if values else 0.0
+
+
+def run_benchmark(corpus, warmup=20):
+    """
+    Replays the corpus through analyze_message and returns a result dict with
+    throughput, latency percentiles and a per-stage time breakdown.
+    """
+    for name in ("sentiment", "embedding", "phrase_store"):
+        registry.get(name)
+    for message in corpus[:warmup]:
+        scam_detection.analyze_message(message)
+
+    stage_totals = defaultdict(float)
+    stage_counts = defaultdict(int)
+
+    def observe(stage, seconds):
+        stage_totals[stage] += seconds
+        stage_counts[stage] += 1
+
+    latencies = []
+    flagged = 0
+    scam_detection.set_stage_observer(observe)
+    try:
+        started = time.perf_counter()
+        for message in corpus:
+            message_started = time.perf_counter()
+            result = scam_detection.analyze_message(message)
+            latencies.append(time.perf_counter() - message_started)
+            if scam_detection.is_alert(result[0]):
+                flagged += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        scam_detection.set_stage_observer(None)
+
+    stage_sum = sum(stage_totals.values()) or 1.0
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "messages": len(corpus),
+        "flagged": flagged,
+        "elapsed_seconds": elapsed,
+        "throughput_msgs_per_second": len(corpus) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": float(np.mean(latencies) * 1000) if latencies else 0.0,
+            "p50": percentile_ms(latencies, 50),
+            "p95": percentile_ms(latencies, 95),
+            "p99": percentile_ms(latencies, 99),
+        },
+        "stages": {
+            stage: {
+                "total_seconds": total,
+                "mean_ms": total / stage_counts[stage] * 1000,
+                "share": total / stage_sum,
+            }
+            for stage, total in sorted(stage_totals.items(), key=lambda item: -item[1])
+        },
+        "models": registry.stats(),
+    }
+
+
+def print_report(result, baseline=None, tolerance=0.1):
+    """
+    Prints a summary; with a baseline, flags stages and percentiles that got
+    slower by more than `tolerance`.
+    """
+    print(f"Messages: {result['messages']} ({result['flagged']} flagged)")
+    print(f"Throughput: {result['throughput_msgs_per_second']:.1f} msg/s")
+    latency = result["latency_ms"]
+    print(f"Latency: p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms")
+    for stage, values in result["stages"].items():
+        print(f"  {stage:<14} {values['mean_ms']:8.3f} ms/msg  {values['share'] * 100:5.1f}%")
+
+    if not baseline:
+        return True
+    regressions = []
+    for key in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"].get(key), latency[key]
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"latency {key}: {old:.2f} -> {new:.2f} ms")
+    for stage, values in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {}).get("mean_ms")
+        if old and values["mean_ms"] > old * (1 + tolerance):
+            regressions.append(f"stage {stage}: {old:.3f} -> {values['mean_ms']:.3f} ms/msg")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return not regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark for analyze_message.")
+    parser.add_argument("--corpus", help="Text file (one message per line) or flagged message CSV.")
+    parser.add_argument("--synthetic", type=int, default=1000, help="Synthetic corpus size when no corpus is given.")
+    parser.add_argument("--network-latency-ms", type=float, default=0.0, help="Simulated latency of stubbed lookups.")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Previous results JSON to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown before reporting a regression.")
+    args = parser.parse_args()
+
+    stub_network(args.network_latency_ms)
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic)
+    result = run_benchmark(corpus, warmup=args.warmup)
+
+    with open(args.output, "w") as output_file:
+        json.dump(result, output_file, indent=2)
+    print(f"Saved results to {args.output}.")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    if not print_report(result, baseline, args.tolerance):
+        raise SystemExit(1)
@@ -0,0 +1,150 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from indicators import domain_suffixes, extract_indicators, url_host
+
+BLOOM_HASHES = 7
+BLOOM_BITS_PER_ENTRY = 10
+
+
+def entry_hash(kind, value):
+    """
+    64-bit key of a blocklist entry; `kind` is "domain", "url" or "wallet".
+    """
+    return int.from_bytes(hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def normalize_url(url):
+    """
+    Lowercases the host and drops the scheme, "www." and trailing slashes,
+    so feed entries and message URLs compare equal.
+    """
+    host = url_host(url)
+    rest = url.split("://", 1)[-1]
+    path = rest[rest.find("/"):] if "/" in rest else ""
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{path.rstrip('/')}"
+
+
+class BlocklistIndex:
+    """
+    Local reputation index built from blocklist dumps.
+
+    Every entry is stored as a 64-bit hash in a sorted array, with a Bloom
+    filter in front of it. Both files are memory-mapped, so millions of
+    entries load instantly. A lookup checks the Bloom filter bits and only
+    on a possible hit binary-searches the sorted array, which rules out
+    Bloom false positives; both take microseconds. Domains match the host
+    of a URL and every parent domain, so blocking example.com also blocks
+    login.example.com.
+    """
+
+    def __init__(self, path="blocklist"):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as meta_file:
+            self.meta = json.load(meta_file)
+        self.bloom = np.memmap(os.path.join(path, "bloom.bin"), dtype=np.uint8, mode="r")
+        self.hashes = np.memmap(os.path.join(path, "hashes.u64"), dtype=np.uint64, mode="r")
+        self.bloom_bits = self.meta["bloom_bits"]
+        self.hits = 0
+        self.lookups = 0
+
+    @classmethod
+    def load(cls, path="blocklist"):
+        """
+        Returns the index at `path`, or None when no blocklist has been built.
+        """
+        if not os.path.isfile(os.path.join(path, "meta.json")):
+            return None
+        return cls(path)
+
+    def _contains_hash(self, key):
+        low, high = key & 0xFFFFFFFF, key >> 32
+        for i in range(BLOOM_HASHES):
+            bit = (low + i * high) % self.bloom_bits
+            if not self.bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        index = int(np.searchsorted(self.hashes, np.uint64(key)))
+        return index < len(self.hashes) and int(self.hashes[index]) == key
+
+    def contains(self, kind, value):
+        self.lookups += 1
+        found = self._contains_hash(entry_hash(kind, value))
+        self.hits += found
+        return found
+
+    def check_url(self, url):
+        """
+        Returns True when the URL or any of its parent domains is listed.
+        """
+        if self.contains("url", normalize_url(url)):
+            return True
+        return any(self.contains("domain", domain) for domain in domain_suffixes(url_host(url)))
+
+    def check_wallet(self, wallet):
+        return self.contains("wallet", wallet)
+
+    def stats(self):
+        return {"entries": len(self.hashes), "lookups": self.lookups, "hits": self.hits}
+
+
+def build_blocklist(path, domains=(), urls=(), wallets=()):
+    """
+    Writes a blocklist index for the given entries and returns its size.
+    """
+    keys = np.fromiter(
+        [entry_hash("domain", domain) for domain in domains]
+        + [entry_hash("url", normalize_url(url)) for url in urls]
+        + [entry_hash("wallet", wallet) for wallet in wallets],
+        dtype=np.uint64,
+    )
+    keys = np.unique(keys)
+    bloom_bits = max(64, len(keys) * BLOOM_BITS_PER_ENTRY)
+    bloom = np.zeros((bloom_bits + 7) // 8, dtype=np.uint8)
+    low, high = keys & np.uint64(0xFFFFFFFF), keys >> np.uint64(32)
+    for i in range(BLOOM_HASHES):
+        bits = (low + np.uint64(i) * high) % np.uint64(bloom_bits)
+        np.bitwise_or.at(bloom, (bits >> np.uint64(3)).astype(np.int64),
+                         (np.uint8(1) << (bits & np.uint64(7)).astype(np.uint8)))
+
+    os.makedirs(path, exist_ok=True)
+    bloom.tofile(os.path.join(path, "bloom.bin"))
+    keys.tofile(os.path.join(path, "hashes.u64"))
+    with open(os.path.join(path, "meta.json"), "w") as meta_file:
+        json.dump({"entries": len(keys), "bloom_bits": bloom_bits, "hashes": BLOOM_HASHES}, meta_file)
+    return len(keys)
+
+
+def read_feed(path):
+    """
+    Yields the entries of a feed file: one per line, "#" comments ignored.
+    Hosts-file lines ("0.0.0.0 example.com") yield the host name.
+    """
+    with open(path, encoding="utf-8", errors="ignore") as feed_file:
+        for line in feed_file:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield line.split()[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline blocklist index.")
+    parser.add_argument("--output", default="blocklist")
+    parser.add_argument("--domains", nargs="*", default=[], help="Domain or hosts-format feeds.")
+    parser.add_argument("--urls", nargs="*", default=[], help="Phishing URL feeds.")
+    parser.add_argument("--wallets", nargs="*", default=[], help="Scam wallet address lists.")
+    args = parser.parse_args()
+
+    domains = [url_host(entry) for feed in args.domains for entry in read_feed(feed)]
+    urls = [entry for feed in args.urls for entry in read_feed(feed)]
+    # Wallet lists go through the extractor so addresses are validated and
+    # normalized the same way as in messages.
+    wallets = [wallet for feed in args.wallets for entry in read_feed(feed)
+               for wallet in extract_indicators(entry)[1]]
+    count = build_blocklist(args.output, [domain for domain in domains if domain], urls, wallets)
+    print(f"Built blocklist with {count} entries in {args.output}.")
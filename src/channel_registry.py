@@ -0,0 +1,103 @@
+from telethon import utils
+from telethon.tl.types import PeerChannel
+
+
+class ChannelRegistry:
+    """
+    The set of monitored channels, keyed by marked peer id (-100...).
+
+    Membership is a set lookup, so `filter` can be the NewMessage event
+    filter: channels added or removed at runtime take effect on the next
+    message without re-registering the handler. Titles are cached, so a
+    channel's entity is fetched at most once. With a FlaggedMessageStore,
+    the monitored set is persisted in its deduplicated channels table.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._ids = set()
+        self._titles = {}
+
+    def __contains__(self, peer_id):
+        return peer_id in self._ids
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def filter(self, event):
+        return event.chat_id in self._ids
+
+    def load(self):
+        """
+        Restores the channels monitored in previous runs.
+        """
+        if self.store is None:
+            return 0
+        for channel_id, name in self.store.monitored_channels():
+            peer_id = utils.get_peer_id(PeerChannel(channel_id))
+            self._ids.add(peer_id)
+            if name:
+                self._titles[peer_id] = name
+        return len(self._ids)
+
+    def add(self, peer_id, title=None, persist=True):
+        """
+        Starts monitoring a marked peer id. Returns False if already monitored.
+        """
+        if title:
+            self._titles[peer_id] = title
+        if peer_id in self._ids:
+            return False
+        self._ids.add(peer_id)
+        if persist and self.store is not None:
+            self.store.set_monitored(utils.resolve_id(peer_id)[0], True, title)
+        return True
+
+    def add_entity(self, entity):
+        """
+        Starts monitoring a channel entity, e.g. a search result.
+        """
+        return self.add(utils.get_peer_id(entity), getattr(entity, "title", None))
+
+    def remove(self, peer_id):
+        """
+        Stops monitoring a channel. Returns False if it was not monitored.
+        """
+        if peer_id not in self._ids:
+            return False
+        self._ids.discard(peer_id)
+        if self.store is not None:
+            self.store.set_monitored(utils.resolve_id(peer_id)[0], False)
+        return True
+
+    async def resolve(self, client, entries):
+        """
+        Adds channels given as marked ids, usernames or links, such as the
+        `target_channels` from config.json. Returns the resolved peer ids.
+        """
+        peer_ids = []
+        for entry in entries:
+            try:
+                peer_id = await client.get_peer_id(entry)
+            except Exception as e:
+                print(f"Error resolving channel {entry}: {e}")
+                continue
+            self.add(peer_id)
+            peer_ids.append(peer_id)
+        return peer_ids
+
+    async def title(self, client, peer_id, chat=None):
+        """
+        Returns the cached channel title, taking it from `chat` or fetching
+        the entity on the first lookup.
+        """
+        title = self._titles.get(peer_id)
+        if title is None:
+            if chat is None:
+                chat = await client.get_entity(peer_id)
+            title = getattr(chat, "title", None) or str(peer_id)
+            self._titles[peer_id] = title
+        return title
@@ -0,0 +1,171 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from indicators import extract_indicators
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_PRIME = (1 << 61) - 1
+_MASK32 = np.uint64((1 << 32) - 1)
+
+
+def normalize_text(message_text):
+    return " ".join(message_text.lower().split())
+
+
+def token_hashes(message_text, shingle_size=1):
+    """
+    Returns the 32-bit hashes of the message's distinct word shingles,
+    empty when it has no words.
+    """
+    tokens = _TOKEN_PATTERN.findall(message_text.lower())
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    shingles = {" ".join(tokens[i:i + shingle_size]) for i in range(max(1, len(tokens) - shingle_size + 1))}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") for s in shingles],
+        dtype=np.uint64,
+    )
+
+
+class DuplicateCache:
+    """
+    Remembers analysis results of recently seen messages.
+
+    Identical texts (after case and whitespace normalisation) are found by
+    content hash. Lightly edited reposts are found by MinHash with LSH
+    banding: messages sharing any band of their signature become candidates
+    and are accepted when the estimated word-set Jaccard similarity reaches
+    `similarity`. Near-duplicates must contain exactly the same URLs and
+    wallets, since those decide the reputation checks, and messages without
+    words (emoji, bare links) are not cached at all. The cache is bounded
+    and evicts the least recently used message. Results expire after `ttl`
+    seconds, so blocklist, keyword and scoring changes reach reposts too.
+    """
+
+    def __init__(self, maxsize=50000, similarity=0.8, num_perm=64, bands=16, seed=1, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def signature(self, message_text):
+        """
+        Returns the MinHash signature of the message's word set.
+        """
+        # Both factors are below 2**32, so the product fits in a uint64 and
+        # is reduced modulo the prime before the offset is added.
+        hashes = token_hashes(message_text) & _MASK32
+        products = np.outer(hashes, self._a & _MASK32) % _PRIME
+        return ((products + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature, indicators):
+        return [
+            (band, indicators, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def _indicator_key(message_text):
+        urls, wallets = extract_indicators(message_text)
+        return hashlib.blake2b("\n".join(sorted(set(urls)) + [""] + sorted(set(wallets))).encode("utf-8"),
+                               digest_size=16).digest()
+
+    def lookup(self, message_text, channel=None):
+        """
+        Returns the cached `(risk_score, flags, explanations)` for the message
+        or a near-duplicate of it, recording the channel sighting; else None.
+        """
+        if not _TOKEN_PATTERN.search(message_text):
+            return None
+        digest = hashlib.blake2b(normalize_text(message_text).encode("utf-8"), digest_size=16).digest()
+        entry = self._entries.get(digest)
+        if entry is not None and entry["expires"] <= time.monotonic():
+            self._remove(digest)
+            entry = None
+        if entry is not None:
+            self.exact_hits += 1
+        else:
+            signature = self.signature(message_text)
+            entry = self._find_near(signature, self._indicator_key(message_text))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.near_hits += 1
+
+        self._entries.move_to_end(entry["digest"])
+        entry["sightings"] += 1
+        if channel is not None:
+            entry["channels"].add(channel)
+        return entry["result"]
+
+    def _find_near(self, signature, indicators):
+        now = time.monotonic()
+        for band_key in self._band_keys(signature, indicators):
+            for digest in self._buckets.get(band_key, ()):
+                entry = self._entries[digest]
+                if entry["expires"] > now and np.mean(entry["signature"] == signature) >= self.similarity:
+                    return entry
+        return None
+
+    def store(self, message_text, result, channel=None):
+        if not _TOKEN_PATTERN.search(message_text):
+            return
+        digest = hashlib.blake2b(normalize_text(message_text).encode("utf-8"), digest_size=16).digest()
+        if digest in self._entries:
+            self._entries[digest]["result"] = result
+            self._entries[digest]["expires"] = time.monotonic() + self.ttl
+            return
+        signature = self.signature(message_text)
+        indicators = self._indicator_key(message_text)
+        self._entries[digest] = {
+            "digest": digest,
+            "signature": signature,
+            "indicators": indicators,
+            "result": result,
+            "expires": time.monotonic() + self.ttl,
+            "sightings": 1,
+            "channels": {channel} if channel is not None else set(),
+        }
+        for band_key in self._band_keys(signature, indicators):
+            self._buckets.setdefault(band_key, set()).add(digest)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, digest):
+        entry = self._entries.pop(digest)
+        for band_key in self._band_keys(entry["signature"], entry["indicators"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(digest)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self):
+        """
+        Forgets every cached result.
+        """
+        self._entries.clear()
+        self._buckets.clear()
+
+    def stats(self):
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# dtype of every scalar column; each is appended to its own file.
+COLUMNS = {
+    "timestamp": np.float64,
+    "risk_score": np.float32,
+    "alert": np.int8,
+    "sentiment_label": np.int8,
+    "sentiment_score": np.float32,
+    "phrase_similarity": np.float32,
+    "knn_similarity": np.float32,
+    "keyword_hits": np.int16,
+    "url_verdict": np.int8,
+    "wallet_verdict": np.int8,
+    "meta_end": np.int64,
+}
+
+_EPSILON = 1e-9
+
+
+class FeatureStore:
+    """
+    Appendable, memory-mapped columnar store of per-message features.
+
+    Every scalar feature is a flat file of one dtype under `path`, the
+    message embeddings are a float16 matrix of English embedding model
+    outputs (NaN rows when no English embedding was computed, including
+    every non-English message, whose multilingual embeddings live in a
+    different space), and meta.jsonl holds the channel, language and text of each
+    row, ending at byte `meta_end`. Rows are buffered and appended
+    `batch_size` at a time. Readers map the files, so re-scoring millions of
+    rows reads only the columns it uses.
+    """
+
+    def __init__(self, path="feature_store", dim=384, batch_size=256, flush_interval=5.0):
+        self.path = path
+        self.dim = dim
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._columns = {}
+        self._embeddings = None
+        self._pending = []
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _sizes(self):
+        sizes = {}
+        for name, dtype in COLUMNS.items():
+            try:
+                sizes[name] = os.path.getsize(self._file(f"{name}.bin")) // np.dtype(dtype).itemsize
+            except OSError:
+                sizes[name] = 0
+        try:
+            sizes["embedding"] = os.path.getsize(self._file("embeddings.f16")) // (2 * self.dim)
+        except OSError:
+            sizes["embedding"] = 0
+        return sizes
+
+    def load(self):
+        """
+        Maps the columns on disk. Rows left incomplete by an interrupted
+        append are truncated first.
+        """
+        sizes = self._sizes()
+        self.count = min(sizes.values())
+        try:
+            meta_size = os.path.getsize(self._file("meta.jsonl"))
+        except OSError:
+            meta_size = 0
+        if max(sizes.values()) > self.count or meta_size > self._meta_end(self.count):
+            self._truncate(self.count)
+        self._columns = {}
+        self._embeddings = None
+        if self.count:
+            for name, dtype in COLUMNS.items():
+                self._columns[name] = np.memmap(self._file(f"{name}.bin"), dtype=dtype, mode="r", shape=(self.count,))
+            self._embeddings = np.memmap(self._file("embeddings.f16"), dtype=np.float16, mode="r",
+                                         shape=(self.count, self.dim))
+
+    def column(self, name):
+        if name == "embedding":
+            return self._embeddings if self._embeddings is not None else np.zeros((0, self.dim), dtype=np.float16)
+        return self._columns.get(name, np.zeros(0, dtype=COLUMNS[name]))
+
+    def add(self, channel, message_text, details, risk_score, alert, timestamp=None):
+        """
+        Buffers the features analyze_message left in `details`. Messages
+        without features (cached or unsupported) are not stored.
+        """
+        features = details.get("features") if details else None
+        if not features:
+            return False
+        row = dict(features, risk_score=risk_score, alert=int(alert), timestamp=timestamp or time.time())
+        embedding = details.get("embedding") if details.get("language") == "en" else None
+        with self._lock:
+            self._pending.append((row, embedding, {
+                "channel": channel, "language": details.get("language"), "text": message_text,
+            }))
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush()
+        return True
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._flushed_at = time.monotonic()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # The metadata goes first, so an interrupted append leaves
+            # it longer than the columns, and load() truncates it back.
+            lines = [(json.dumps(meta) + "\n").encode("utf-8") for _, _, meta in pending]
+            with open(self._file("meta.jsonl"), "ab") as meta_file:
+                start = meta_file.tell()
+                meta_file.write(b"".join(lines))
+            for (row, _, _), end in zip(pending, np.cumsum([len(line) for line in lines]) + start):
+                row["meta_end"] = end
+            for name, dtype in COLUMNS.items():
+                values = np.array([row[name] for row, _, _ in pending], dtype=dtype)
+                with open(self._file(f"{name}.bin"), "ab") as column_file:
+                    column_file.write(values.tobytes())
+            embeddings = np.full((len(pending), self.dim), np.nan, dtype=np.float16)
+            for i, (_, embedding, _) in enumerate(pending):
+                if embedding is not None and len(embedding) == self.dim:
+                    embeddings[i] = embedding
+            with open(self._file("embeddings.f16"), "ab") as embeddings_file:
+                embeddings_file.write(embeddings.tobytes())
+        except Exception as e:
+            print(f"Error writing {len(pending)} rows to the feature store: {e}")
+        self.load()
+
+    def truncate(self, rows):
+        """
+        Drops every row from `rows` on, e.g. rows written by an interrupted
+        batch job that will write them again.
+        """
+        with self._lock:
+            self._pending = []
+            if rows < self.count:
+                self._truncate(rows)
+                self.load()
+
+    def _meta_end(self, rows):
+        if not rows:
+            return 0
+        return int(np.fromfile(self._file("meta_end.bin"), dtype=np.int64, count=1, offset=(rows - 1) * 8)[0])
+
+    def _truncate(self, rows):
+        meta_end = self._meta_end(rows)
+        for name, dtype in COLUMNS.items():
+            if os.path.exists(self._file(f"{name}.bin")):
+                os.truncate(self._file(f"{name}.bin"), rows * np.dtype(dtype).itemsize)
+        if os.path.exists(self._file("embeddings.f16")):
+            os.truncate(self._file("embeddings.f16"), rows * 2 * self.dim)
+        if os.path.exists(self._file("meta.jsonl")):
+            os.truncate(self._file("meta.jsonl"), meta_end)
+
+    def meta(self):
+        """
+        Yields the metadata dict of every stored row, in row order.
+        """
+        try:
+            with open(self._file("meta.jsonl"), encoding="utf-8") as meta_file:
+                for row, line in enumerate(meta_file):
+                    if row >= self.count:
+                        return
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def stats(self):
+        return {"rows": self.count, "pending": len(self._pending)}
+
+
+def phrase_similarities(embeddings, phrase_embeddings, chunk_size=262144):
+    """
+    Returns the max cosine similarity of each stored embedding to the
+    phrases, NaN where no embedding was stored.
+    """
+    from phrase_store import normalize_rows
+    phrases = normalize_rows(np.asarray(phrase_embeddings, dtype=np.float32))
+    result = np.full(len(embeddings), np.nan, dtype=np.float32)
+    for start in range(0, len(embeddings), chunk_size):
+        chunk = normalize_rows(np.asarray(embeddings[start:start + chunk_size], dtype=np.float32))
+        similarities = (chunk @ phrases.T).max(axis=1)
+        result[start:start + len(chunk)] = np.where(np.isnan(chunk[:, 0]), np.nan, similarities)
+    return result
+
+
+def default_scoring():
+    """
+    Returns the scoring configuration analyze_message runs with, read from
+    scam_detection so it follows config.json; a re-score config overrides
+    any of its keys.
+    """
+    import scam_detection
+    return {
+        "weights": {stage.name: stage.weight for stage in scam_detection.SCORING_STAGES},
+        "alert_threshold": scam_detection.ALERT_THRESHOLD,
+        "sentiment_threshold": scam_detection.SENTIMENT_THRESHOLD,
+        "similarity_threshold": scam_detection.SIMILARITY_THRESHOLD,
+    }
+
+
+def rescore(store, config=None, keyword_hits=None, phrase_similarity=None):
+    """
+    Applies a scoring configuration to every stored row with vectorized
+    NumPy and returns `{"score", "alert", "fired", "undetermined"}`.
+    `keyword_hits` and `phrase_similarity` replace the stored columns, e.g.
+    after matching a new keyword list or phrase set. Stages that did not
+    run at ingest count as not fired; rows where they could still flip the
+    decision are marked undetermined.
+    """
+    defaults = default_scoring()
+    config = {**defaults, **(config or {})}
+    weights = {**defaults["weights"], **config.get("weights", {})}
+    keyword_hits = store.column("keyword_hits") if keyword_hits is None else keyword_hits
+    phrase_similarity = store.column("phrase_similarity") if phrase_similarity is None else phrase_similarity
+    similarity = np.fmax(phrase_similarity, store.column("knn_similarity"))
+    sentiment_label = store.column("sentiment_label")
+
+    fired = {
+        "keywords": keyword_hits > 0,
+        "sentiment": (sentiment_label == 1) & (store.column("sentiment_score") > config["sentiment_threshold"]),
+        "similarity": similarity > config["similarity_threshold"],
+        "url_check": store.column("url_verdict") == 1,
+        "wallet_check": store.column("wallet_verdict") == 1,
+    }
+    missing = {
+        "keywords": keyword_hits < 0,
+        "sentiment": sentiment_label < 0,
+        "similarity": np.isnan(similarity),
+        "url_check": store.column("url_verdict") < 0,
+        "wallet_check": store.column("wallet_verdict") < 0,
+    }
+    score = np.zeros(store.count, dtype=np.float32)
+    unknown = np.zeros(store.count, dtype=np.float32)
+    for name, weight in weights.items():
+        score += weight * fired[name]
+        unknown += weight * missing[name]
+    threshold = config["alert_threshold"] - _EPSILON
+    alert = (score > 0) & (score >= threshold)
+    return {
+        "score": score,
+        "alert": alert,
+        "fired": fired,
+        "undetermined": ~alert & (score + unknown >= threshold),
+    }
+
+
+def backtest(store, config=None, keywords_path=None, phrases_path=None):
+    """
+    Re-scores the store and compares the result with the stored decisions.
+    """
+    started = time.perf_counter()
+    keyword_hits = phrase_similarity = None
+    if keywords_path:
+        from keyword_index import KeywordIndex
+        index = KeywordIndex(path=keywords_path)
+        keyword_hits = np.fromiter((len(index.find(row["text"])) for row in store.meta()),
+                                   dtype=np.int16, count=store.count)
+    if phrases_path:
+        from model_registry import registry
+        with open(phrases_path, encoding="utf-8") as phrases_file:
+            phrases = [line.strip() for line in phrases_file if line.strip()]
+        phrase_embeddings = registry.get("embedding").encode(phrases, convert_to_numpy=True)
+        # Rows without an English embedding keep their similarity from ingest.
+        phrase_similarity = phrase_similarities(store.column("embedding"), phrase_embeddings)
+        phrase_similarity = np.where(np.isnan(phrase_similarity), store.column("phrase_similarity"), phrase_similarity)
+    matched = time.perf_counter()
+
+    result = rescore(store, config, keyword_hits, phrase_similarity)
+    before = np.asarray(store.column("alert")).astype(bool)
+    after = result["alert"]
+    report = {
+        "rows": store.count,
+        "flagged_before": int(before.sum()),
+        "flagged_after": int(after.sum()),
+        "newly_flagged": int((after & ~before).sum()),
+        "no_longer_flagged": int((before & ~after).sum()),
+        "undetermined": int(result["undetermined"].sum()),
+        "fired": {name: int(values.sum()) for name, values in result["fired"].items()},
+        "match_seconds": matched - started,
+        "rescore_seconds": time.perf_counter() - matched,
+    }
+    return report, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and re-score the per-message feature store.")
+    parser.add_argument("--store", default="feature_store")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("stats", help="Show the number of stored rows.")
+    rescore_parser = subcommands.add_parser("rescore", help="Apply a new scoring configuration to stored messages.")
+    rescore_parser.add_argument("--config", help="JSON with weights, alert_threshold, sentiment_threshold "
+                                                 "and/or similarity_threshold.")
+    rescore_parser.add_argument("--keywords", help="Keyword file to match against the stored texts.")
+    rescore_parser.add_argument("--phrases", help="Suspicious phrases (one per line) to compare the stored "
+                                                  "embeddings with; needs the embedding model.")
+    rescore_parser.add_argument("--output", help="Save the new scores as a .npy file.")
+    args = parser.parse_args()
+
+    feature_store = FeatureStore(args.store)
+    if args.command == "stats":
+        print(feature_store.stats())
+    else:
+        scoring = None
+        if args.config:
+            with open(args.config) as config_file:
+                scoring = json.load(config_file)
+        report, result = backtest(feature_store, scoring, args.keywords, args.phrases)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            np.save(args.output, result["score"])
+            print(f"Saved {len(result['score'])} scores to {args.output}.")
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+FLAGGED_CSV_HEADERS = ["Channel Name", "Message Text", "Risk Score", "Flags", "Explanations"]
+CHANNELS_CSV_HEADERS = ["Channel ID", "Name", "Username", "Members"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flagged_messages (
+    id INTEGER PRIMARY KEY,
+    channel TEXT,
+    message TEXT,
+    risk_score REAL,
+    flags TEXT,
+    explanations TEXT,
+    timestamp REAL,
+    channel_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_flagged_channel ON flagged_messages (channel);
+CREATE INDEX IF NOT EXISTS idx_flagged_timestamp ON flagged_messages (timestamp);
+CREATE INDEX IF NOT EXISTS idx_flagged_risk_score ON flagged_messages (risk_score);
+CREATE INDEX IF NOT EXISTS idx_flagged_flags ON flagged_messages (flags);
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id INTEGER PRIMARY KEY,
+    name TEXT,
+    username TEXT,
+    members INTEGER,
+    updated REAL,
+    monitored INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    # Databases created before channel monitoring was persisted lack the column.
+    if "monitored" not in {row[1] for row in connection.execute("PRAGMA table_info(channels)")}:
+        connection.execute("ALTER TABLE channels ADD COLUMN monitored INTEGER NOT NULL DEFAULT 0")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_channels_monitored ON channels (monitored)")
+    # Nor did flagged messages record the channel id.
+    if "channel_id" not in {row[1] for row in connection.execute("PRAGMA table_info(flagged_messages)")}:
+        connection.execute("ALTER TABLE flagged_messages ADD COLUMN channel_id INTEGER")
+    return connection
+
+
+class FlaggedMessageStore:
+    """
+    SQLite store for flagged messages and channel metadata.
+
+    Writes are queued and committed in batches by a background thread, so the
+    message handlers never wait on disk I/O.
+    """
+
+    def __init__(self, path="flagged_messages.db", batch_size=200, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._reader = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_loop, name="flagged-store", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Flushes pending writes and stops the writer thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def add_flagged(self, channel_name, message_text, risk_score, flags, explanations, timestamp=None,
+                    channel_id=None):
+        """
+        Queues a flagged message; `channel_id` is the marked peer id
+        (-100...) of its channel, when known.
+        """
+        if self._thread is None:
+            self.start()
+        self._queue.put((
+            "INSERT INTO flagged_messages (channel, message, risk_score, flags, explanations, timestamp, channel_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (channel_name, message_text, risk_score, flags, json.dumps(explanations), timestamp or time.time(),
+             channel_id),
+        ))
+
+    def add_channels(self, channels_data):
+        """
+        Inserts or updates `[channel_id, name, username, members]` rows,
+        keeping each channel's monitored state.
+        """
+        if self._thread is None:
+            self.start()
+        for channel_id, name, username, members in channels_data:
+            self._queue.put((
+                "INSERT INTO channels (channel_id, name, username, members, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (channel_id) DO UPDATE SET name = excluded.name, username = excluded.username, "
+                "members = excluded.members, updated = excluded.updated",
+                (channel_id, name, username, members if isinstance(members, int) else None, time.time()),
+            ))
+
+    def set_monitored(self, channel_id, monitored, name=None):
+        """
+        Marks a channel as monitored or not, creating its row if needed.
+        """
+        if self._thread is None:
+            self.start()
+        self._queue.put((
+            "INSERT INTO channels (channel_id, name, updated, monitored) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (channel_id) DO UPDATE SET monitored = excluded.monitored, "
+            "name = COALESCE(excluded.name, channels.name), updated = excluded.updated",
+            (channel_id, name, time.time(), int(monitored)),
+        ))
+
+    def monitored_channels(self):
+        """
+        Returns `(channel_id, name)` for every monitored channel.
+        """
+        if self._reader is None:
+            self._reader = connect(self.path)
+        return self._reader.execute("SELECT channel_id, name FROM channels WHERE monitored = 1").fetchall()
+
+    def flagged_counts(self, since=None):
+        """
+        Returns `{marked channel id: number of flagged messages}`, optionally
+        only counting messages flagged after `since`. Messages stored without
+        a channel id are matched to a channel by name.
+        """
+        if self._reader is None:
+            self._reader = connect(self.path)
+        where, params = ("WHERE f.timestamp >= ?", (since,)) if since is not None else ("", ())
+        rows = self._reader.execute(
+            "SELECT COALESCE(f.channel_id, -1000000000000 - c.channel_id) AS peer_id, COUNT(*) "
+            f"FROM flagged_messages f LEFT JOIN channels c ON f.channel_id IS NULL AND c.name = f.channel {where} "
+            "GROUP BY peer_id", params
+        ).fetchall()
+        return {peer_id: count for peer_id, count in rows if peer_id is not None}
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        running = True
+        while running:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if item is None:
+                running = False
+            try:
+                with connection:
+                    for statement, params in batch:
+                        connection.execute(statement, params)
+            except Exception as e:
+                print(f"Error writing {len(batch)} rows to {self.path}: {e}")
+        connection.close()
+
+    def flagged(self, channel=None, min_score=None, since=None, flag=None, limit=1000):
+        """
+        Returns flagged message rows filtered by the indexed columns.
+        """
+        if self._reader is None:
+            self._reader = connect(self.path)
+        clauses, params = [], []
+        if channel is not None:
+            clauses.append("channel = ?")
+            params.append(channel)
+        if min_score is not None:
+            clauses.append("risk_score >= ?")
+            params.append(min_score)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if flag is not None:
+            clauses.append("flags LIKE ?")
+            params.append(f"%{flag}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._reader.execute(
+            f"SELECT channel, message, risk_score, flags, explanations, timestamp FROM flagged_messages "
+            f"{where} ORDER BY timestamp DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+
+
+def export_csv(db_path, csv_path, table="flagged"):
+    """
+    Exports the flagged messages or channels table with the original CSV layout.
+    """
+    connection = connect(db_path)
+    try:
+        with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            if table == "channels":
+                writer.writerow(CHANNELS_CSV_HEADERS)
+                rows = connection.execute("SELECT channel_id, name, username, members FROM channels ORDER BY channel_id")
+                writer.writerows([channel_id, name, username or "N/A", "N/A" if members is None else members]
+                                 for channel_id, name, username, members in rows)
+            else:
+                writer.writerow(FLAGGED_CSV_HEADERS)
+                rows = connection.execute(
+                    "SELECT channel, message, risk_score, flags, explanations FROM flagged_messages ORDER BY id"
+                )
+                writer.writerows([channel, message, risk_score, flags, json.loads(explanations)]
+                                 for channel, message, risk_score, flags, explanations in rows)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flagged message store tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export a table to CSV.")
+    export_parser.add_argument("csv_path")
+    export_parser.add_argument("--db", default="flagged_messages.db")
+    export_parser.add_argument("--table", choices=["flagged", "channels"], default="flagged")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_csv(args.db, args.csv_path, args.table)
+        print(f"Exported {args.table} from {args.db} to {args.csv_path}.")
@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from model_registry import registry
+
+
+class ImageAnalyzer:
+    """
+    OCR stage for photo messages.
+
+    Media is downloaded through Telethon, downscaled so its longest side is at
+    most `max_side` pixels, and read by the shared EasyOCR reader on a single
+    worker thread. The text of every read image is cached by a hash of its
+    bytes, so reposts of an image return the cached text without another
+    OCR pass. Perceptual hashes are not used: text screenshots with the
+    same layout share them whatever the text says. Images whose OCR failed
+    are not cached.
+    """
+
+    def __init__(self, models=registry, max_side=1280, seen_cache_size=50000):
+        self.models = models
+        self.max_side = max_side
+        self.seen_cache_size = seen_cache_size
+        self._texts = OrderedDict()
+        # The cache is used from the event loop and the OCR thread.
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+        self.images = 0
+        self.duplicates = 0
+        self.ocr_seconds = 0.0
+
+    async def extract_text(self, client, message):
+        """
+        Returns the text found in a message's photo, or None if there is no
+        image, no text or OCR failed.
+        """
+        data = await client.download_media(message, file=bytes)
+        if not data:
+            return None
+        content_key = hashlib.sha256(data).digest()
+        text = self._cached_text(content_key)
+        if text is not None:
+            self.duplicates += 1
+            return text or None
+
+        text, latency = await asyncio.get_running_loop().run_in_executor(self._executor, self._read, data)
+        if text is None:
+            return None
+        self._cache_text(content_key, text)
+        self.images += 1
+        self.ocr_seconds += latency
+        print(f"Extracted {len(text or '')} characters from image in {latency * 1000:.0f} ms.")
+        return text or None
+
+    def _read(self, data):
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.thumbnail((self.max_side, self.max_side))
+            reader = self.models.get("ocr")
+            if reader is None:
+                return None, 0.0
+            started = time.perf_counter()
+            result = reader.readtext(np.asarray(image.convert("RGB")))
+            return " ".join(item[1] for item in result), time.perf_counter() - started
+        except Exception as e:
+            print(f"Error extracting text from image: {e}")
+            return None, 0.0
+
+    def _cached_text(self, key):
+        """
+        Returns the OCR text cached under `key` ("" for images without
+        text), or None if the image has not been read.
+        """
+        with self._lock:
+            text = self._texts.get(key)
+            if text is not None:
+                self._texts.move_to_end(key)
+            return text
+
+    def _cache_text(self, key, text):
+        with self._lock:
+            self._texts[key] = text
+            self._texts.move_to_end(key)
+            if len(self._texts) > self.seen_cache_size:
+                self._texts.popitem(last=False)
+
+    def stats(self):
+        return {
+            "images": self.images,
+            "duplicates_skipped": self.duplicates,
+            "avg_ocr_ms": (self.ocr_seconds / self.images * 1000) if self.images else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
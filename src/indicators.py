@@ -0,0 +1,196 @@
+import hashlib
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BECH32_ALPHABET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+_BECH32_INDEX = {char: index for index, char in enumerate(BECH32_ALPHABET)}
+
+# One pass over the text finds every indicator; the alternatives are tried
+# in order at each position, so URLs win over addresses embedded in them.
+_INDICATOR_PATTERN = re.compile(
+    r"(?P<url>\b(?:https?://|www\.)[^\s<>\"'`]+)"
+    r"|(?<![0-9A-Za-z])(?:"
+    r"(?P<eth>0x[0-9a-fA-F]{40})"
+    r"|(?P<bech32>(?:bc1|tb1|BC1|TB1)[02-9ac-hj-np-zAC-HJ-NP-Z]{8,87})"
+    r"|(?P<tron>T[1-9A-HJ-NP-Za-km-z]{33})"
+    r"|(?P<base58>[13][1-9A-HJ-NP-Za-km-z]{25,34})"
+    r")(?![0-9A-Za-z])"
+)
+_TRAILING_PUNCTUATION = ".,;:!?)]}'\""
+
+
+def _keccak_f(state):
+    rotations = [
+        [0, 36, 3, 41, 18], [1, 44, 10, 45, 2], [62, 6, 43, 15, 61], [28, 55, 25, 21, 56], [27, 20, 39, 8, 14],
+    ]
+    mask = (1 << 64) - 1
+    rc = 1
+    for _ in range(24):
+        c = [state[x][0] ^ state[x][1] ^ state[x][2] ^ state[x][3] ^ state[x][4] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ (((c[(x + 1) % 5] << 1) | (c[(x + 1) % 5] >> 63)) & mask) for x in range(5)]
+        state = [[state[x][y] ^ d[x] for y in range(5)] for x in range(5)]
+        b = [[0] * 5 for _ in range(5)]
+        for x in range(5):
+            for y in range(5):
+                r = rotations[x][y]
+                b[y][(2 * x + 3 * y) % 5] = ((state[x][y] << r) | (state[x][y] >> (64 - r))) & mask if r else state[x][y]
+        state = [[b[x][y] ^ (~b[(x + 1) % 5][y] & b[(x + 2) % 5][y]) for y in range(5)] for x in range(5)]
+        round_constant = 0
+        for bit in range(7):
+            rc_bit = rc & 1
+            rc = ((rc << 1) ^ (0x71 if rc & 0x80 else 0)) & 0xFF
+            if rc_bit:
+                round_constant |= 1 << ((1 << bit) - 1)
+        state[0][0] ^= round_constant
+    return state
+
+
+def keccak256(data):
+    """
+    Keccak-256 as used by Ethereum (original padding, not NIST SHA3-256).
+    """
+    rate = 136
+    padded = bytearray(data) + b"\x01" + b"\x00" * ((rate - (len(data) + 1) % rate) % rate)
+    padded[-1] |= 0x80
+    state = [[0] * 5 for _ in range(5)]
+    for offset in range(0, len(padded), rate):
+        block = padded[offset:offset + rate]
+        for i in range(rate // 8):
+            state[i % 5][i // 5] ^= int.from_bytes(block[8 * i:8 * i + 8], "little")
+        state = _keccak_f(state)
+    return b"".join(state[i % 5][i // 5].to_bytes(8, "little") for i in range(4))
+
+
+def base58check_payload(address):
+    """
+    Returns the decoded payload of a Base58Check string, or None if the
+    checksum does not match.
+    """
+    number = 0
+    for char in address:
+        number = number * 58 + _BASE58_INDEX[char]
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    raw = b"\x00" * (len(address) - len(address.lstrip("1"))) + raw
+    if len(raw) < 5:
+        return None
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        return None
+    return payload
+
+
+def base58check_encode(payload):
+    """
+    Encodes `payload` with a Base58Check checksum; the inverse of
+    base58check_payload.
+    """
+    raw = payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+    number = int.from_bytes(raw, "big")
+    chars = []
+    while number:
+        number, remainder = divmod(number, 58)
+        chars.append(BASE58_ALPHABET[remainder])
+    return "1" * (len(raw) - len(raw.lstrip(b"\x00"))) + "".join(reversed(chars))
+
+
+def _bech32_polymod(values):
+    generator = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1FFFFFF) << 5 ^ value
+        for i in range(5):
+            checksum ^= generator[i] if (top >> i) & 1 else 0
+    return checksum
+
+
+def is_valid_bech32(address):
+    """
+    Validates a SegWit address with a bech32 (v0) or bech32m (v1+) checksum.
+    """
+    if address.lower() != address and address.upper() != address:
+        return False
+    address = address.lower()
+    hrp, _, data = address.rpartition("1")
+    if hrp not in ("bc", "tb") or len(data) < 7:
+        return False
+    values = [_BECH32_INDEX[char] for char in data]
+    expanded = [ord(char) >> 5 for char in hrp] + [0] + [ord(char) & 31 for char in hrp]
+    constant = _bech32_polymod(expanded + values)
+    witness_version = values[0]
+    return constant == (1 if witness_version == 0 else 0x2BC830A3)
+
+
+def is_valid_eth(address):
+    """
+    Validates an Ethereum address; mixed-case addresses must carry a valid
+    EIP-55 checksum.
+    """
+    body = address[2:]
+    if body.lower() == body or body.upper() == body:
+        return True
+    digest = keccak256(body.lower().encode("ascii")).hex()
+    return all(
+        (char.upper() if int(digest[i], 16) >= 8 else char.lower()) == char
+        for i, char in enumerate(body)
+    )
+
+
+def normalize_wallet(kind, address):
+    return address.lower() if kind in ("eth", "bech32") else address
+
+
+@lru_cache(maxsize=65536)
+def _is_valid(kind, address):
+    if kind == "eth":
+        return is_valid_eth(address)
+    if kind == "bech32":
+        return is_valid_bech32(address)
+    payload = base58check_payload(address)
+    if payload is None or len(payload) != 21:
+        return False
+    if kind == "tron":
+        return payload[0] == 0x41
+    return payload[0] in (0x00, 0x05)
+
+
+def extract_indicators(message_text):
+    """
+    Returns `(urls, wallets)` found in one pass over the text. Wallets are
+    checksum-validated Bitcoin (legacy and SegWit), Ethereum and TRON
+    addresses, normalized for lookups (hex and bech32 lowercased).
+    """
+    urls, wallets = [], []
+    for match in _INDICATOR_PATTERN.finditer(message_text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "url":
+            urls.append(value.rstrip(_TRAILING_PUNCTUATION))
+        elif _is_valid(kind, value):
+            wallets.append(normalize_wallet(kind, value))
+    return urls, wallets
+
+
+def url_host(url):
+    """
+    Returns the lowercased host of a URL, with or without a scheme.
+    """
+    if "://" not in url:
+        url = f"http://{url}"
+    try:
+        host = urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+    return host.rstrip(".")
+
+
+def domain_suffixes(host):
+    """
+    Returns the host and each parent domain down to the registrable part,
+    e.g. a.b.example.com -> a.b.example.com, b.example.com, example.com.
+    """
+    labels = host.split(".")
+    return [".".join(labels[i:]) for i in range(max(1, len(labels) - 1))]
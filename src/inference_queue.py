@@ -0,0 +1,125 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import inference_seconds
+
+
+class InferenceQueue:
+    """
+    Micro-batching front end for the sentiment pipeline and the sentence encoder.
+
+    Messages are collected for up to `max_latency_ms` or until `max_batch_size`
+    items are waiting, then both models run once on the whole batch in a worker
+    thread. Each caller awaits a future resolving to `(sentiment, embedding)`.
+    Models are fetched from the registry on the first batch.
+    """
+
+    def __init__(self, models, max_batch_size=32, max_latency_ms=20,
+                 sentiment_name="sentiment", embedding_name="embedding"):
+        self.models = models
+        self.sentiment_name = sentiment_name
+        self.embedding_name = embedding_name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_latency = max(0, max_latency_ms) / 1000.0
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.batches = 0
+        self.items = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def start(self):
+        """
+        Starts the batching task on the running event loop.
+        """
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Cancels the batching task and releases the inference thread.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, message_text):
+        """
+        Queues a message and waits for its `(sentiment, embedding)` result.
+        """
+        if self._task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message_text, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+
+    async def _process(self, batch):
+        started = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            wait = started - enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        self.batches += 1
+        self.items += len(batch)
+
+        texts = [text for text, _, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self._infer, texts)
+            inference_seconds.observe(time.perf_counter() - started)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _infer(self, texts):
+        sentiment_model = self.models.get(self.sentiment_name)
+        if sentiment_model:
+            sentiments = sentiment_model(texts, batch_size=len(texts), truncation=True)
+        else:
+            sentiments = [None] * len(texts)
+        nlp_model = self.models.get(self.embedding_name)
+        if nlp_model:
+            embeddings = nlp_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+        else:
+            embeddings = [None] * len(texts)
+        return list(zip(sentiments, embeddings))
+
+    def stats(self):
+        """
+        Returns batch fill rate and queue wait counters.
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "avg_batch_fill": (self.items / self.batches / self.max_batch_size) if self.batches else 0.0,
+            "avg_queue_wait_ms": (self.total_wait / self.items * 1000) if self.items else 0.0,
+            "max_queue_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from rapidfuzz import fuzz, process
+
+KeywordMatch = namedtuple("KeywordMatch", ["keyword", "start", "end", "score"])
+
+
+def _fold(text):
+    """
+    Case-folds `text` one character at a time. Returns the folded text and,
+    for each of its characters, the offset of the original character it
+    came from, since folding can change the length ("İ" folds to two).
+    """
+    folded, offsets = [], []
+    for position, char in enumerate(text):
+        char = char.casefold()
+        folded.append(char)
+        offsets.extend([position] * len(char))
+    return "".join(folded), offsets
+
+
+def _normalize(text, offsets):
+    """
+    Replaces each run of spaces and punctuation in folded `text` with a
+    single space, keeping the original offset of every remaining character.
+    """
+    normalized, kept = [], []
+    for char, offset in zip(text, offsets):
+        if char.isalnum():
+            normalized.append(char)
+            kept.append(offset)
+        elif normalized and normalized[-1] != " ":
+            normalized.append(" ")
+            kept.append(offset)
+    if normalized and normalized[-1] == " ":
+        normalized.pop()
+        kept.pop()
+    return "".join(normalized), kept
+
+
+class _Automaton:
+    """
+    Aho-Corasick automaton over case-folded keywords.
+    """
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword in keywords:
+            self._add(keyword)
+        self._build_failure_links()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(keyword)
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """
+        Yields `(keyword, start, end)` for every exact occurrence in `text`.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                yield keyword, position - len(keyword) + 1, position + 1
+
+
+class KeywordIndex:
+    """
+    Compiled scam keyword matcher.
+
+    Exact hits are found in one pass with an Aho-Corasick automaton. Keywords
+    without an exact hit are then compared with rapidfuzz partial_ratio
+    against the message with punctuation and spaces normalised, so variants
+    such as "no-risk" or "guaranteedprofit" still match. Match positions
+    refer to the original message. When a keyword file is given it is
+    re-read whenever its mtime changes.
+    """
+
+    def __init__(self, keywords=(), path=None, threshold=85, check_interval=5):
+        self.default_keywords = list(keywords)
+        self.path = path
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._compiled = None
+        if path and os.path.isfile(path):
+            self.reload()
+        else:
+            self.load(self.default_keywords)
+
+    def load(self, keywords):
+        """
+        Compiles a new keyword list and swaps it in atomically.
+        """
+        keywords = list(dict.fromkeys(k.strip() for k in keywords if k.strip()))
+        folded = [_fold(k)[0] for k in keywords]
+        normalized = {k: _normalize(k, range(len(k)))[0] for k in folded}
+        original = dict(zip(folded, keywords))
+        self._compiled = (_Automaton(folded), normalized, original)
+        self.keywords = keywords
+
+    def reload(self):
+        """
+        Loads keywords from the keyword file, one per line; '#' starts a comment.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as keyword_file:
+                keywords = [line.split("#", 1)[0] for line in keyword_file]
+            self._mtime = os.path.getmtime(self.path)
+            self.load(keywords)
+            print(f"Loaded {len(self.keywords)} keywords from {self.path}.")
+        except Exception as e:
+            print(f"Error loading keywords from {self.path}: {e}")
+
+    def reload_if_changed(self):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime != self._mtime:
+                self.reload()
+
+    def find(self, message_text):
+        """
+        Returns a list of KeywordMatch for exact and near-miss keyword hits.
+        """
+        self.reload_if_changed()
+        automaton, normalized, original = self._compiled
+        text, offsets = _fold(message_text)
+
+        matches = {}
+        for keyword, start, end in automaton.search(text):
+            matches.setdefault(
+                keyword, KeywordMatch(original[keyword], offsets[start], offsets[end - 1] + 1, 100.0)
+            )
+
+        # partial_ratio aligns the shorter string inside the longer one, so a
+        # message much shorter than a keyword would match any part of it.
+        text, offsets = _normalize(text, offsets)
+        pending = [
+            k for k in normalized
+            if k not in matches and normalized[k] and len(text) * 100 >= len(normalized[k]) * self.threshold
+        ]
+        if not pending or not text:
+            return sorted(matches.values(), key=lambda match: match.start)
+
+        scores = process.cdist(
+            [normalized[k] for k in pending], [text], scorer=fuzz.partial_ratio, score_cutoff=self.threshold
+        )
+        for row, keyword in enumerate(pending):
+            if scores[row][0] < self.threshold:
+                continue
+            alignment = fuzz.partial_ratio_alignment(normalized[keyword], text)
+            start, end = offsets[alignment.dest_start], offsets[alignment.dest_end - 1] + 1
+            matches[keyword] = KeywordMatch(original[keyword], start, end, float(scores[row][0]))
+
+        return sorted(matches.values(), key=lambda match: match.start)
@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from array import array
+
+import numpy as np
+from aiohttp import web
+
+import main
+from benchmark import load_corpus, percentile_ms, stub_network, synthetic_corpus
+from feature_store import FeatureStore
+from model_registry import resident_memory_mb
+
+_TOKEN_PATTERN = re.compile(r"\[lt:(\d+)\]")
+
+
+class FakeChat:
+    def __init__(self, chat_id, title):
+        self.id = chat_id
+        self.title = title
+
+
+class FakeMessage:
+    def __init__(self, message_id, text):
+        self.id = message_id
+        self.message = text
+        self.photo = None
+
+
+class FakeEvent:
+    """
+    Stands in for a Telethon NewMessage event.
+    """
+
+    def __init__(self, chat, message):
+        self.chat = chat
+        self.chat_id = chat.id
+        self.message = message
+
+
+def rate_at(profile, elapsed, rate, duration, burst_factor=5.0, burst_seconds=5.0, burst_period=60.0):
+    """
+    Returns the offered message rate at `elapsed` seconds: "steady" is
+    constant, "bursty" multiplies the rate by `burst_factor` for
+    `burst_seconds` of every `burst_period`, "ramp" rises linearly from 0
+    to `rate` over the run.
+    """
+    if profile == "bursty":
+        return rate * burst_factor if elapsed % burst_period < burst_seconds else rate
+    if profile == "ramp":
+        return max(rate * elapsed / duration, 0.1)
+    return rate
+
+
+class StubAlertEndpoint:
+    """
+    Local stand-in for the Bot API sendMessage call. Records when each
+    load-test message id first appears in an alert.
+    """
+
+    def __init__(self):
+        self.received = {}
+        self.requests = 0
+        self._runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+
+    async def _handle(self, request):
+        payload = await request.json()
+        self.requests += 1
+        now = time.perf_counter()
+        for token in _TOKEN_PATTERN.findall(payload.get("text", "")):
+            self.received.setdefault(int(token), now)
+        return web.json_response({"ok": True, "result": {}})
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class LoadTest:
+    """
+    Replays a corpus through main.monitor_new_messages with fake events and
+    measures end-to-end lag, event-loop stalls and memory growth.
+    """
+
+    def __init__(self, corpus, channels=100, profile="steady", rate=50.0, duration=60.0,
+                 report_interval=10.0, stall_interval=0.05, seed=0, **profile_options):
+        self.corpus = corpus
+        self.profile = profile
+        self.rate = rate
+        self.duration = duration
+        self.report_interval = report_interval
+        self.stall_interval = stall_interval
+        self.profile_options = profile_options
+        self.rng = random.Random(seed)
+        self.chats = [FakeChat(-1009000000000 - i, f"loadtest-{i}") for i in range(channels)]
+        # Compact arrays keep the harness's own memory flat over long runs;
+        # sent[i] is the arrival time of message i.
+        self.sent = array("d")
+        self.lags = array("d")
+        self.stalls = array("d")
+        self.rss = []
+        self.windows = []
+        self.completed = 0
+        self.flagged = 0
+        self._tasks = set()
+
+    async def _handle(self, message_id, event):
+        await main.monitor_new_messages(event)
+        self.lags.append(time.perf_counter() - self.sent[message_id])
+        self.completed += 1
+
+    def count_flagged(self, add_flagged):
+        """
+        Wraps the store's add_flagged to count flagged messages.
+        """
+        def add_and_count(*args, **kwargs):
+            self.flagged += 1
+            return add_flagged(*args, **kwargs)
+        return add_and_count
+
+    async def _watch_loop(self, stop):
+        """
+        Sleeps in short steps; oversleeping means something blocked the loop.
+        """
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(self.stall_interval)
+            self.stalls.append(max(0.0, time.perf_counter() - started - self.stall_interval))
+
+    async def _report(self, stop, started):
+        last_completed, last_sent, last_lags = 0, 0, 0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.report_interval)
+            except asyncio.TimeoutError:
+                pass
+            rss = resident_memory_mb()
+            self.rss.append(rss)
+            window_lags = self.lags[last_lags:]
+            window = {
+                "elapsed_seconds": round(time.perf_counter() - started, 1),
+                "offered_per_second": (len(self.sent) - last_sent) / self.report_interval,
+                "completed_per_second": (self.completed - last_completed) / self.report_interval,
+                "backlog": len(self.sent) - self.completed,
+                "lag_p95_ms": percentile_ms(window_lags, 95),
+                "loop_stall_max_ms": max(self.stalls[-int(self.report_interval / self.stall_interval):], default=0.0) * 1000,
+                "rss_mb": rss,
+            }
+            self.windows.append(window)
+            print(f"[{window['elapsed_seconds']:>7.1f}s] offered {window['offered_per_second']:.1f}/s, "
+                  f"done {window['completed_per_second']:.1f}/s, backlog {window['backlog']}, "
+                  f"p95 lag {window['lag_p95_ms']:.0f} ms, stall {window['loop_stall_max_ms']:.0f} ms, "
+                  f"rss {rss if rss is None else round(rss)} MB")
+            last_completed, last_sent, last_lags = self.completed, len(self.sent), len(self.lags)
+
+    async def run(self):
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        watchers = [asyncio.create_task(self._watch_loop(stop)), asyncio.create_task(self._report(stop, started))]
+        self.rss.append(resident_memory_mb())
+        next_send = started
+        while True:
+            now = time.perf_counter()
+            elapsed = now - started
+            if elapsed >= self.duration:
+                break
+            if now < next_send:
+                await asyncio.sleep(next_send - now)
+                continue
+            message_id = len(self.sent)
+            text = f"[lt:{message_id}] {self.corpus[message_id % len(self.corpus)]}"
+            event = FakeEvent(self.rng.choice(self.chats), FakeMessage(message_id, text))
+            self.sent.append(time.perf_counter())
+            task = asyncio.create_task(self._handle(message_id, event))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            next_send += 1.0 / rate_at(self.profile, elapsed, self.rate, self.duration, **self.profile_options)
+
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
+        stop.set()
+        await asyncio.gather(*watchers)
+        return time.perf_counter() - started
+
+    def result(self, elapsed, alerts):
+        alert_lags = [alerts.received[i] - self.sent[i] for i in alerts.received if i < len(self.sent)]
+        rss = [value for value in self.rss if value is not None]
+        return {
+            "profile": self.profile,
+            "rate": self.rate,
+            "channels": len(self.chats),
+            "duration_seconds": elapsed,
+            "offered": len(self.sent),
+            "completed": self.completed,
+            "flagged": self.flagged,
+            "throughput_msgs_per_second": self.completed / elapsed if elapsed else 0.0,
+            "lag_ms": {
+                "p50": percentile_ms(self.lags, 50),
+                "p95": percentile_ms(self.lags, 95),
+                "p99": percentile_ms(self.lags, 99),
+                "max": max(self.lags, default=0.0) * 1000,
+            },
+            "alert_lag_ms": {
+                "alerts": len(alert_lags),
+                "requests": alerts.requests,
+                "p50": percentile_ms(alert_lags, 50),
+                "p95": percentile_ms(alert_lags, 95),
+                "max": max(alert_lags, default=0.0) * 1000,
+            },
+            "loop_stall_ms": {
+                "p99": percentile_ms(self.stalls, 99),
+                "max": max(self.stalls, default=0.0) * 1000,
+                "total": float(np.sum(self.stalls)) * 1000,
+            },
+            "rss_mb": {
+                "start": rss[0] if rss else None,
+                "end": rss[-1] if rss else None,
+                "max": max(rss) if rss else None,
+                "growth": rss[-1] - rss[0] if rss else None,
+            },
+            "max_backlog": max((window["backlog"] for window in self.windows), default=0),
+            "windows": self.windows,
+        }
+
+
+async def run_load_test(args):
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic)
+    alerts = StubAlertEndpoint()
+    await alerts.start()
+
+    # Everything after the Telegram client runs for real: the analysis path,
+    # the flagged store (in a separate database) and the alert dispatcher
+    # (pointed at the local stub). Reputation lookups stay local.
+    stub_network(args.network_latency_ms)
+    main.reputation_client.remote = False
+    main.flagged_store.path = args.db
+    if main.feature_store is not None:
+        main.feature_store = FeatureStore(args.features)
+    main.channel_registry.store = None
+    main.alert_dispatcher.api_base = alerts.url
+    main.flagged_store.start()
+    await main.reputation_client.start()
+    main.alert_dispatcher.start()
+    main.inference_queue.start()
+    if main.ANALYSIS_MODE == "process":
+        main.analysis_executor.start()
+    else:
+        main.registry.prewarm(["prefilter", "sentiment", "embedding", "phrase_store", "scam_index"]).join()
+
+    test = LoadTest(
+        corpus, channels=args.channels, profile=args.profile, rate=args.rate, duration=args.duration,
+        report_interval=args.report_interval, burst_factor=args.burst_factor,
+        burst_seconds=args.burst_seconds, burst_period=args.burst_period,
+    )
+    for chat in test.chats:
+        main.channel_registry.add(chat.id, chat.title)
+    main.flagged_store.add_flagged = test.count_flagged(main.flagged_store.add_flagged)
+    deferred_task = asyncio.create_task(main.overload.run_deferred(main.analyze_deferred))
+    try:
+        elapsed = await test.run()
+        await main.alert_dispatcher.stop()
+    finally:
+        deferred_task.cancel()
+        await main.inference_queue.stop()
+        await main.analysis_executor.shutdown()
+        await main.reputation_client.close()
+        main.flagged_store.close()
+        if main.feature_store is not None:
+            main.feature_store.flush()
+        await alerts.stop()
+    result = test.result(elapsed, alerts)
+    result["overload"] = main.overload.stats()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the message handler with fake Telegram events.")
+    parser.add_argument("--corpus", help="Text file (one message per line) or flagged message CSV.")
+    parser.add_argument("--synthetic", type=int, default=1000, help="Synthetic corpus size when no corpus is given.")
+    parser.add_argument("--profile", choices=["steady", "bursty", "ramp"], default="steady")
+    parser.add_argument("--rate", type=float, default=50.0, help="Messages per second (peak rate for ramp).")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to send messages for.")
+    parser.add_argument("--channels", type=int, default=100, help="Number of fake channels.")
+    parser.add_argument("--burst-factor", type=float, default=5.0)
+    parser.add_argument("--burst-seconds", type=float, default=5.0)
+    parser.add_argument("--burst-period", type=float, default=60.0)
+    parser.add_argument("--network-latency-ms", type=float, default=0.0, help="Simulated latency of stubbed lookups.")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    parser.add_argument("--db", default="loadtest_flagged.db", help="Database for flagged messages.")
+    parser.add_argument("--features", default="loadtest_features", help="Feature store directory.")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load_test(args))
+    with open(args.output, "w") as output_file:
+        json.dump(result, output_file, indent=2)
+    print(f"Completed {result['completed']}/{result['offered']} messages "
+          f"({result['throughput_msgs_per_second']:.1f} msg/s), max backlog {result['max_backlog']}.")
+    print(f"Lag p50 {result['lag_ms']['p50']:.1f} ms, p99 {result['lag_ms']['p99']:.1f} ms; "
+          f"alert lag p95 {result['alert_lag_ms']['p95']:.0f} ms; "
+          f"loop stall max {result['loop_stall_ms']['max']:.1f} ms; RSS growth {result['rss_mb']['growth']} MB.")
+    print(f"Saved results to {args.output}.")
@@ -3,9 +3,29 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 import json
 import csv
 import asyncio
+import time
 from telethon import TelegramClient, events, functions, types
 from telethon.errors.rpcerrorlist import ChatAdminRequiredError
-from scam_detection import analyze_message, save_to_csv, send_real_time_alert
+from scam_detection import (
+    analyze_message, format_alert, set_stage_observer, is_alert, is_keyword_match, needs_model_stages,
+    prefilter_scores, prefilter_clears, PHISHING_API, WALLET_VERIFICATION_API, MULTILINGUAL, MODEL_STAGES,
+)
+from indicators import extract_indicators
+from multilingual import detect_languages, model_output_cache
+from inference_queue import InferenceQueue
+from analysis_pool import AnalysisExecutor
+from reputation import ReputationClient
+from dedup_cache import DuplicateCache
+from backfill import BackfillScheduler
+from flagged_store import FlaggedMessageStore
+from model_registry import registry
+from image_analysis import ImageAnalyzer
+from alerts import AlertDispatcher
+from sharding import ShardCoordinator
+from channel_registry import ChannelRegistry
+from overload import OverloadController
+from feature_store import FeatureStore
+import metrics
 
 # Load configuration
 with open("config.json", "r") as config_file:
@@ -16,89 +36,355 @@ API_HASH = config["telegram_api"]["api_hash"]
 ADMIN_CHAT_ID = config["telegram_api"]["admin_chat_id"]
 TARGET_CHANNELS = config["target_channels"]
 CHANNELS_CSV_PATH = "channels.csv"
+SETTINGS = config.get("settings", {})
+ANALYSIS_MODE = SETTINGS.get("analysis_mode", "batched")
 
 client = TelegramClient("crypto_scanner", API_ID, API_HASH)
 
+inference_queue = InferenceQueue(
+    registry,
+    max_batch_size=SETTINGS.get("inference_batch_size", 32),
+    max_latency_ms=SETTINGS.get("inference_max_latency_ms", 20),
+)
+
+multilingual_queue = InferenceQueue(
+    registry,
+    max_batch_size=SETTINGS.get("inference_batch_size", 32),
+    max_latency_ms=SETTINGS.get("inference_max_latency_ms", 20),
+    sentiment_name="multilingual_sentiment",
+    embedding_name="multilingual_embedding",
+)
+
+analysis_executor = AnalysisExecutor(
+    workers=SETTINGS.get("analysis_workers"),
+    max_in_flight=SETTINGS.get("analysis_max_in_flight"),
+)
+
+reputation_client = ReputationClient(
+    PHISHING_API,
+    WALLET_VERIFICATION_API,
+    cache_size=SETTINGS.get("reputation_cache_size", 10000),
+    cache_ttl=SETTINGS.get("reputation_cache_ttl", 3600),
+    cache_path=SETTINGS.get("reputation_cache_path"),
+    url_timeout=SETTINGS.get("url_check_timeout", 5),
+    wallet_timeout=SETTINGS.get("wallet_check_timeout", 5),
+    url_rate=SETTINGS.get("url_check_rate", 10),
+    wallet_rate=SETTINGS.get("wallet_check_rate", 10),
+    blocklist=lambda: registry.get("blocklist"),
+    remote=SETTINGS.get("remote_reputation", True),
+)
+
+duplicate_cache = DuplicateCache(
+    maxsize=SETTINGS.get("duplicate_cache_size", 50000),
+    similarity=SETTINGS.get("duplicate_similarity", 0.8),
+    ttl=SETTINGS.get("duplicate_cache_ttl", 3600),
+)
+
+flagged_store = FlaggedMessageStore(SETTINGS.get("db_path", "flagged_messages.db"))
+
+channel_registry = ChannelRegistry(flagged_store)
+
+image_analyzer = ImageAnalyzer(max_side=SETTINGS.get("ocr_max_side", 1280))
+
+alert_dispatcher = AlertDispatcher(
+    format_alert,
+    digest_window=SETTINGS.get("alert_digest_window", 0.0),
+    min_interval=SETTINGS.get("alert_min_interval", 1.0),
+)
+
+overload = OverloadController(
+    latency_target=SETTINGS.get("overload_latency_target", 2.0),
+    min_backlog=SETTINGS.get("overload_min_backlog", 8),
+    priority_min_flagged=SETTINGS.get("overload_priority_min_flagged", 1),
+    max_deferred=SETTINGS.get("overload_max_deferred", 10000),
+    enabled=SETTINGS.get("overload_control", True),
+)
+
+feature_store = FeatureStore(SETTINGS.get("feature_store_path", "feature_store")) \
+    if SETTINGS.get("feature_store_enabled", True) else None
+
+
+def enable_metrics():
+    """
+    Turns on metrics collection, the local /metrics endpoint and the
+    periodic metrics log line.
+    """
+    metrics.metrics.enabled = True
+    set_stage_observer(lambda stage, seconds: metrics.stage_seconds.observe(seconds, stage=stage))
+    metrics.queue_depth.set_function(
+        lambda: inference_queue.stats()["queue_depth"] + analysis_executor.in_flight
+    )
+    metrics.cache_hit_rate.set_function(lambda: {
+        "duplicate": duplicate_cache.stats()["hit_rate"],
+        "reputation": reputation_client.cache.hits / max(1, reputation_client.cache.hits + reputation_client.cache.misses),
+    })
+    metrics.deferred_depth.set_function(lambda: len(overload.deferred))
+    metrics.metrics.start_http_server(SETTINGS.get("metrics_port", 9108))
+    return asyncio.create_task(metrics.metrics.log_periodically(SETTINGS.get("metrics_log_interval", 60)))
+
+
+async def analyze_text(message_text, channel=None, lang=None, details=None, prefilter_score=None, skip_stages=()):
+    """
+    Returns the cached result for reposted or near-duplicate spam, otherwise
+    runs analyze_message, caches the result and records the message's
+    features. Results of shed messages (`skip_stages` set) are not kept.
+    """
+    cached = duplicate_cache.lookup(message_text, channel)
+    if cached is not None:
+        return cached
+    result = await run_analysis(message_text, lang, details, prefilter_score, skip_stages)
+    if not skip_stages:
+        duplicate_cache.store(message_text, result, channel)
+        if feature_store is not None and details is not None:
+            feature_store.add(channel, message_text, details, result[0], is_alert(result[0]))
+    return result
+
+
+async def run_analysis(message_text, lang=None, details=None, prefilter_score=None, skip_stages=()):
+    """
+    Runs analyze_message in the configured mode: "process" ships the text to
+    the worker pool, "batched" batches the model inference through the queue.
+    URL and wallet reputation is checked concurrently by the async client.
+    `prefilter_score` may be passed when the pre-filter scored a batch.
+    """
+    url_flags, wallet_flags = await reputation_client.check_message(*extract_indicators(message_text))
+    if lang is None:
+        lang = detect_languages([message_text])[0]
+    if ANALYSIS_MODE == "process":
+        details = {} if details is None else details
+        result = await analysis_executor.analyze(
+            message_text, details=details, url_flags=url_flags, wallet_flags=wallet_flags, lang=lang,
+            prefilter_score=prefilter_score, skip_stages=skip_stages,
+        )
+        # The workers' own metrics are not exported, so count their stages here.
+        for stage, seconds in details.get("stage_seconds", ()):
+            metrics.stage_seconds.observe(seconds, stage=stage)
+        for stage in details.get("skipped", ()):
+            metrics.stages_skipped.inc(stage=stage)
+        return result
+
+    # Only queue the message for the models when the cheap signals and the
+    # pre-filter leave the alert decision open. Non-English messages go to the
+    # multilingual models, whose outputs are cached by content.
+    keyword_flag = is_keyword_match(message_text)
+    if lang == "en" and prefilter_score is None:
+        prefilter_score = prefilter_scores([message_text])[0]
+    sentiment = embedding = None
+    if ((lang == "en" and not prefilter_clears(prefilter_score)) or (lang != "en" and MULTILINGUAL)) \
+            and not set(MODEL_STAGES) <= set(skip_stages) and needs_model_stages(keyword_flag, url_flags, wallet_flags, lang):
+        if lang == "en":
+            sentiment, embedding = await inference_queue.submit(message_text)
+        else:
+            outputs = model_output_cache.get(message_text)
+            if outputs is None:
+                outputs = await multilingual_queue.submit(message_text)
+                model_output_cache.put(message_text, outputs)
+            sentiment, embedding = outputs
+    return analyze_message(
+        message_text, sentiment=sentiment, message_embedding=embedding,
+        url_flags=url_flags, wallet_flags=wallet_flags, keyword_flag=keyword_flag, lang=lang, details=details,
+        prefilter_score=prefilter_score, skip_stages=skip_stages,
+    )
+
+
+async def report_flagged(channel_id, channel_name, message_text, risk_score, flags, explanations, details):
+    """
+    Stores, alerts on and indexes a flagged message, and raises the
+    channel's priority with the overload controller.
+    """
+    metrics.messages_flagged.inc(channel=channel_name)
+    overload.record_flagged(channel_id)
+
+    flagged_store.add_flagged(channel_name, message_text, risk_score, flags, explanations, channel_id=channel_id)
+
+    alert_dispatcher.submit(channel_name, message_text, risk_score, flags)
+
+    await index_flagged(channel_name, message_text, details, risk_score)
+
+
+async def analyze_deferred(channel_id, channel_name, message_text):
+    """
+    Full analysis of a message that was shed while the bot was behind.
+    """
+    details = {}
+    risk_score, flags, explanations = await analyze_text(message_text, channel_name, details=details)
+    if is_alert(risk_score):
+        await report_flagged(channel_id, channel_name, message_text, risk_score, flags, explanations, details)
+
+
+async def index_flagged(channel_name, message_text, details, risk_score):
+    """
+    Adds a flagged English message to the scam index, which also assigns it
+    to a campaign of near-identical posts. Messages that skipped the models
+    are embedded through the inference queue. Off by default: every indexed
+    false positive raises the similarity score of messages like it.
+    """
+    if not SETTINGS.get("scam_index_add_flagged", False) or risk_score < SETTINGS.get("scam_index_min_score", 0.6):
+        return None
+    lang = details.get("language") or detect_languages([message_text])[0]
+    if lang != "en":
+        return None
+    try:
+        embedding = details.get("embedding")
+        if embedding is None:
+            _, embedding = await inference_queue.submit(message_text)
+        scam_index = registry.get("scam_index")
+        if scam_index is None or embedding is None:
+            return None
+        campaigns = await asyncio.get_running_loop().run_in_executor(
+            None, scam_index.add, embedding, [channel_name], [message_text]
+        )
+        return campaigns[0]
+    except Exception as e:
+        print(f"Error indexing flagged message: {e}")
+        return None
+
 async def fetch_channels_by_keyword(keyword):
+    """
+    Searches channels by keyword, saves them and starts monitoring them.
+    """
     try:
         result = await client(functions.contacts.SearchRequest(
             q=keyword,
             limit=50
         ))
         channels_data = []
+        added = 0
         for chat in result.chats:
-            from telethon.tl.types import Channel
-
-            if isinstance(chat, Channel): 
+            if isinstance(chat, types.Channel):
                 channels_data.append([
                     chat.id,
                     chat.title,
                     chat.username or "N/A",
                     chat.participants_count or "N/A",
                 ])
-                TARGET_CHANNELS.append(chat.id)
+                added += channel_registry.add_entity(chat)
 
-        save_to_csv(channels_data, "channels.csv", headers=["Channel ID", "Name", "Username", "Members"])
-        print(f"Fetched and saved {len(channels_data)} channels related to {keyword}.")
+        flagged_store.add_channels(channels_data)
+        print(f"Fetched {len(channels_data)} channels related to {keyword}, {added} of them new.")
     except Exception as e:
         print(f"Error fetching channels by keyword: {e}")
 
-from datetime import datetime
 
-async def fetch_last_messages(channel_id):
+async def analyze_history(channel_id, messages):
     """
-    Fetch the last 100 messages from a channel and analyze them.
+    Analyze one page of channel history fetched by the backfill scheduler.
+    Pages wait while the overload controller is behind, so the backfill
+    only uses capacity the live messages leave free.
     """
-    try:
-        channel_entity = await client.get_entity(channel_id)
-        channel_name = channel_entity.title
-
-        messages = await client(functions.messages.GetHistoryRequest(
-            peer=channel_id,
-            offset_id=0,
-            offset_date=None,
-            add_offset=0,
-            limit=100,
-            max_id=0,
-            min_id=0,
-            hash=0
-        ))
+    await overload.wait_until_caught_up()
+    channel_name = await channel_registry.title(client, channel_id)
 
-        for message in messages.messages:
-            if hasattr(message, "message") and message.message:
-                risk_score, flags, explanations = analyze_message(message.message)
-                if risk_score > 0:
+    texts = [message.message for message in messages
+             if hasattr(message, "message") and message.message]
+    metrics.messages_received.inc(len(texts), channel=channel_name)
+    languages = detect_languages(texts)
+    details = [{"language": lang} for lang in languages]
+    english = [i for i, lang in enumerate(languages) if lang == "en"]
+    scores = [None] * len(texts)
+    for i, score in zip(english, prefilter_scores([texts[i] for i in english])):
+        scores[i] = score
+    results = await asyncio.gather(
+        *(analyze_text(text, channel_name, lang, text_details, score)
+          for text, lang, text_details, score in zip(texts, languages, details, scores)),
+        return_exceptions=True,
+    )
 
-                    save_to_csv([[channel_name, message.message, risk_score, flags, explanations]])
-                   
-                    send_real_time_alert(channel_name, message.message, risk_score, flags)
-    except ChatAdminRequiredError:
-        print(f"Cannot fetch messages from channel {channel_id}: Admin rights required.")
-    except Exception as e:
-        print(f"Error fetching messages from channel {channel_id}: {e}")
+    for text, result, text_details in zip(texts, results, details):
+        if isinstance(result, Exception):
+            print(f"Error analyzing message from channel {channel_id}: {result}")
+            continue
+        metrics.messages_analyzed.inc(channel=channel_name)
+        risk_score, flags, explanations = result
+        if is_alert(risk_score):
+            await report_flagged(channel_id, channel_name, text, risk_score, flags, explanations, text_details)
 
-@client.on(events.NewMessage(chats=TARGET_CHANNELS))
+
+backfill = BackfillScheduler(
+    client,
+    analyze_history,
+    checkpoint_path=SETTINGS.get("backfill_checkpoint_path", "backfill_checkpoint.json"),
+    concurrency=SETTINGS.get("backfill_concurrency", 8),
+    page_size=SETTINGS.get("backfill_page_size", 100),
+    max_messages=SETTINGS.get("backfill_max_messages", 1000),
+)
+
+@client.on(events.NewMessage(func=channel_registry.filter))
 async def monitor_new_messages(event):
     """
-    Real-time monitoring of new messages in target channels.
+    Real-time monitoring of new messages in target channels. While the bot
+    is behind, the overload controller sheds the model stages for
+    low-priority channels and defers those messages.
     """
+    token = overload.admit()
     try:
         message = event.message
-        if message and hasattr(message, "message") and message.message:
-            print(f"New message in {event.chat.title}: {message.message}")
-                        
-            risk_score, flags, explanations = analyze_message(message.message)
-            if risk_score > 0:
-               
-                save_to_csv([[event.chat.title, message.message, risk_score, flags, explanations]])
-               
-                send_real_time_alert(event.chat.title, message.message, risk_score, flags)
+        text = message.message if message and hasattr(message, "message") and message.message else ""
+        if message and getattr(message, "photo", None):
+            image_text = await image_analyzer.extract_text(client, message)
+            if image_text:
+                text = f"{text}\n{image_text}".strip()
+        if text:
+            channel_name = await channel_registry.title(client, event.chat_id, event.chat)
+            print(f"New message in {channel_name}: {text}")
+            metrics.messages_received.inc(channel=channel_name)
+
+            skip_stages = overload.decide(event.chat_id)
+            details = {}
+            risk_score, flags, explanations = await analyze_text(
+                text, channel_name, details=details, skip_stages=skip_stages
+            )
+            metrics.messages_analyzed.inc(channel=channel_name)
+            if is_alert(risk_score):
+                await report_flagged(event.chat_id, channel_name, text, risk_score, flags, explanations, details)
+            elif skip_stages:
+                overload.defer(event.chat_id, channel_name, text)
     except Exception as e:
         print(f"Error processing new message: {e}")
+    finally:
+        overload.finish(token)
+
+@client.on(events.NewMessage(chats="me", pattern=r"^/(monitor|unmonitor)\s+(\S+)"))
+async def manage_channels(event):
+    """
+    Adds or removes a monitored channel at runtime. Send "/monitor @channel"
+    or "/unmonitor -1001234567890" to your Saved Messages.
+    """
+    command, entry = event.pattern_match.group(1), event.pattern_match.group(2)
+    try:
+        peer_id = await client.get_peer_id(int(entry) if entry.lstrip("-").isdigit() else entry)
+        if command == "monitor":
+            changed = channel_registry.add(peer_id, await channel_registry.title(client, peer_id))
+        else:
+            changed = channel_registry.remove(peer_id)
+        status = "updated" if changed else "unchanged"
+        await event.reply(f"{entry}: {status}, {len(channel_registry)} channels monitored.")
+    except Exception as e:
+        await event.reply(f"Error updating channel {entry}: {e}")
 
 async def main():
     print("Starting Telegram Scam Detection Bot...")
     await client.start()
+    flagged_store.start()
+    channel_registry.load()
+    await channel_registry.resolve(client, TARGET_CHANNELS)
+    overload.load_history(flagged_store.flagged_counts(
+        since=time.time() - SETTINGS.get("overload_history_days", 30) * 86400
+    ))
+    metrics_task = enable_metrics() if SETTINGS.get("metrics_enabled") else None
+    await reputation_client.start()
+    alert_dispatcher.start()
+    # The inference queue also embeds flagged messages for the scam index in
+    # process mode; its models load on first use.
+    inference_queue.start()
+    if ANALYSIS_MODE == "process":
+        analysis_executor.start()
+    else:
+        prewarm = ["prefilter", "sentiment", "embedding", "phrase_store", "scam_index"]
+        if MULTILINGUAL:
+            multilingual_queue.start()
+            prewarm += ["multilingual_sentiment", "multilingual_embedding", "multilingual_phrase_store"]
+        registry.prewarm(prewarm)
   
     print("You can add new channel IDs for the bot to monitor.")
     add_target_channels()
@@ -107,11 +393,66 @@ async def main():
     for keyword in keywords:
         await fetch_channels_by_keyword(keyword)
    
-    for channel_id in TARGET_CHANNELS:
-        await fetch_last_messages(channel_id)
+    fetched = await backfill.run(list(channel_registry))
+    print(f"Backfilled {fetched} messages from {len(channel_registry)} channels.")
 
     print("Bot is now running in real-time mode.")
-    await client.run_until_disconnected()
+    deferred_task = asyncio.create_task(overload.run_deferred(analyze_deferred))
+    try:
+        await client.run_until_disconnected()
+    finally:
+        deferred_task.cancel()
+        print(f"Overload controller stats: {overload.stats()}")
+        await alert_dispatcher.stop()
+        print(f"Alert dispatcher stats: {alert_dispatcher.stats()}")
+        print(f"Inference queue stats: {inference_queue.stats()}")
+        await inference_queue.stop()
+        await multilingual_queue.stop()
+        await analysis_executor.shutdown()
+        print(f"Reputation client stats: {reputation_client.stats()}")
+        await reputation_client.close()
+        print(f"Duplicate cache stats: {duplicate_cache.stats()}")
+        flagged_store.close()
+        if feature_store is not None:
+            feature_store.flush()
+        print(f"Image analyzer stats: {image_analyzer.stats()}")
+        image_analyzer.shutdown()
+        print(f"Model registry stats: {registry.stats()}")
+        if metrics_task is not None:
+            metrics_task.cancel()
+            metrics.metrics.stop_http_server()
+
+async def run_sharded():
+    """
+    Sharded deployment: worker processes monitor the channels with their own
+    sessions, and this process stores and alerts on what they flag.
+    """
+    print(f"Starting Telegram Scam Detection Bot with {SETTINGS['shards']} shards...")
+    flagged_store.start()
+    alert_dispatcher.start()
+
+    def on_flagged(channel_name, text, risk_score, flags, explanations):
+        metrics.messages_flagged.inc(channel=channel_name)
+        flagged_store.add_flagged(channel_name, text, risk_score, flags, explanations)
+        alert_dispatcher.submit(channel_name, text, risk_score, flags)
+
+    channel_registry.load()
+    coordinator = ShardCoordinator(
+        list(dict.fromkeys([*TARGET_CHANNELS, *channel_registry])),
+        shards=SETTINGS["shards"],
+        on_flagged=on_flagged,
+        heartbeat_interval=SETTINGS.get("shard_heartbeat_interval", 5.0),
+        heartbeat_timeout=SETTINGS.get("shard_heartbeat_timeout", 30.0),
+    )
+    try:
+        await coordinator.run()
+    except RuntimeError as e:
+        print(f"Error starting shards: {e}")
+    finally:
+        print(f"Shard coordinator stats: {coordinator.stats()}")
+        coordinator.stop()
+        await alert_dispatcher.stop()
+        flagged_store.close()
 
 def add_target_channels():
     """
@@ -126,12 +467,17 @@ def add_target_channels():
                 print("Channel ID must start with '-100'. Please try again.")
                 continue
             try:
-                TARGET_CHANNELS.append(int(new_channel_id))
-                print(f"Channel ID {new_channel_id} added successfully!")
+                if channel_registry.add(int(new_channel_id)):
+                    print(f"Channel ID {new_channel_id} added successfully!")
+                else:
+                    print(f"Channel ID {new_channel_id} is already monitored.")
             except ValueError:
                 print("Invalid input. Please enter a valid numeric channel ID.")
     except KeyboardInterrupt:
         print("\nExiting channel addition process...")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if SETTINGS.get("shards", 1) > 1:
+        asyncio.run(run_sharded())
+    else:
+        asyncio.run(main())
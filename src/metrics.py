@@ -0,0 +1,232 @@
+import asyncio
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Gauge set directly or read from a callback at collection time. A
+    callback may return a number or a dict of `{label value: number}`.
+    """
+    kind = "gauge"
+
+    def __init__(self, registry, name, help_text, labelnames=(), function=None):
+        super().__init__(registry, name, help_text, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self):
+        if self.function is None:
+            return [(self.name, key, value) for key, value in self._values.items()]
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, (label,), number) for label, number in value.items()]
+        return [(self.name, (), value)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            values = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((f"{self.name}_bucket", key + (le,), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+    def summary(self):
+        """
+        Returns `{label values: (count, mean seconds)}` for the log line.
+        """
+        with self._lock:
+            return {key: (count, total / count if count else 0.0) for key, (_, total, count) in self._values.items()}
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics. While disabled every update returns immediately,
+    so instrumented code pays one attribute check per call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics = []
+        self._server = None
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), function=None):
+        return self._add(Gauge(self, name, help_text, labelnames, function))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, help_text, labelnames, buckets))
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            labelnames = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+            for name, key, value in metric.samples():
+                names = labelnames if name.endswith("_bucket") else metric.labelnames
+                lines.append(f"{name}{_format_labels(names, key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Returns a compact dict of all metrics for the periodic log line.
+        """
+        snapshot = {}
+        for metric in self._metrics:
+            if isinstance(metric, Histogram):
+                values = {",".join(map(str, key)) or "all": {"count": count, "mean_ms": round(mean * 1000, 3)}
+                          for key, (count, mean) in metric.summary().items()}
+            else:
+                values = {",".join(map(str, key)) or "all": value for _, key, value in metric.samples()}
+            if values:
+                snapshot[metric.name] = values
+        return snapshot
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """
+        Serves /metrics on a background thread.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics available at http://{host}:{port}/metrics")
+
+    def stop_http_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    async def log_periodically(self, interval=60):
+        """
+        Prints one JSON metrics line every `interval` seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps({"event": "metrics", "time": time.time(), "metrics": self.snapshot()}, default=str))
+
+
+metrics = MetricsRegistry()
+
+messages_received = metrics.counter("scambot_messages_received_total", "Messages received.", ["channel"])
+messages_analyzed = metrics.counter("scambot_messages_analyzed_total", "Messages analysed.", ["channel"])
+messages_flagged = metrics.counter("scambot_messages_flagged_total", "Messages flagged as risky.", ["channel"])
+queue_depth = metrics.gauge("scambot_queue_depth", "Messages waiting for analysis.")
+stages_skipped = metrics.counter("scambot_stages_skipped_total", "Scoring stages skipped by early exit.", ["stage"])
+stage_seconds = metrics.histogram("scambot_stage_seconds", "Time spent in each analyze_message stage.", ["stage"])
+inference_seconds = metrics.histogram("scambot_inference_batch_seconds", "Model inference time per batch.")
+alert_seconds = metrics.histogram("scambot_alert_send_seconds", "Time to send an alert.")
+alert_failures = metrics.counter("scambot_alert_failures_total", "Alerts that could not be sent.")
+cache_hit_rate = metrics.gauge("scambot_cache_hit_rate", "Hit rate per cache.", ["cache"])
+load_shedding = metrics.counter(
+    "scambot_load_shedding_total", "Overload controller decisions: full, priority, shed, deferred, dropped, recovered, paused.",
+    ["decision"],
+)
+deferred_depth = metrics.gauge("scambot_deferred_queue_depth", "Shed messages waiting for full analysis.")
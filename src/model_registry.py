@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-MiniLM-L6-v2"
+SENTIMENT_MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+MULTILINGUAL_EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+MULTILINGUAL_SENTIMENT_MODEL_NAME = "cardiffnlp/twitter-xlm-roberta-base-sentiment"
+TRANSLATION_MODEL_NAME = "Helsinki-NLP/opus-mt-mul-en"
+
+
+def resident_memory_mb():
+    """
+    Returns the resident set size of this process in MB, or None if unknown.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads models on first use instead of at import time.
+
+    Each model is registered with a loader function and built at most once,
+    either by the first `get()` or by `prewarm()` in a background thread.
+    A loader that raises leaves the model as None, which callers treat as
+    "model unavailable".
+    """
+
+    def __init__(self):
+        self.backend = "pytorch"
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._stats = {}
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+        return self._models[name]
+
+    def _load(self, name):
+        rss_before = resident_memory_mb()
+        started = time.perf_counter()
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            print(f"Error loading model '{name}': {e}")
+            model = None
+        rss_after = resident_memory_mb()
+        self._stats[name] = {
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+            "available": model is not None,
+        }
+        return model
+
+    def prewarm(self, names=None):
+        """
+        Loads the given models (default: all) in a background thread.
+        """
+        names = list(names or self._loaders)
+        thread = threading.Thread(target=lambda: [self.get(name) for name in names],
+                                  name="model-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """
+        Returns load time and resident memory growth per loaded model.
+        """
+        stats = {name: dict(values) for name, values in self._stats.items()}
+        stats["rss_mb"] = resident_memory_mb()
+        return stats
+
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def _load_sentiment_model():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL_NAME)
+
+
+def _load_multilingual_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MULTILINGUAL_EMBEDDING_MODEL_NAME)
+
+
+def _load_multilingual_sentiment_model():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=MULTILINGUAL_SENTIMENT_MODEL_NAME)
+
+
+def _load_local_translator():
+    from transformers import pipeline
+    return pipeline("translation", model=TRANSLATION_MODEL_NAME)
+
+
+def _load_translator():
+    from googletrans import Translator
+    return Translator()
+
+
+def _load_ocr_reader():
+    import easyocr
+    return easyocr.Reader(['en'])
+
+
+registry = ModelRegistry()
+registry.register("embedding", _load_embedding_model)
+registry.register("sentiment", _load_sentiment_model)
+registry.register("translator", _load_translator)
+registry.register("ocr", _load_ocr_reader)
+registry.register("multilingual_embedding", _load_multilingual_embedding_model)
+registry.register("multilingual_sentiment", _load_multilingual_sentiment_model)
+registry.register("local_translator", _load_local_translator)
+
+
+def configure_backend(backend="pytorch", threads=None, cache_dir="onnx_models"):
+    """
+    Selects the inference backend for the English sentiment and embedding
+    models: "pytorch", "onnx" or "onnx-int8" (dynamically quantized). ONNX
+    models are exported once into `cache_dir` and only used after passing a
+    parity check against PyTorch.
+    """
+    if backend not in ("pytorch", "onnx", "onnx-int8"):
+        print(f"Unknown inference backend '{backend}', using pytorch.")
+        return
+    registry.backend = backend
+    if backend == "pytorch":
+        return
+    from onnx_backend import load_onnx_model
+    quantize = backend == "onnx-int8"
+    registry.register("sentiment", lambda: load_onnx_model(
+        "sentiment", SENTIMENT_MODEL_NAME, _load_sentiment_model, quantize, threads, cache_dir
+    ))
+    registry.register("embedding", lambda: load_onnx_model(
+        "embedding", EMBEDDING_MODEL_NAME, _load_embedding_model, quantize, threads, cache_dir
+    ))
@@ -0,0 +1,105 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import langid
+
+from model_registry import registry
+
+
+def use_offline_models():
+    """
+    Makes transformers and sentence-transformers load models from the local
+    cache only, so the multilingual mode never touches the network.
+    """
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def restrict_languages(languages):
+    """
+    Limits language identification to the given ISO codes, which is both
+    faster and more accurate for the languages the monitored channels use.
+    """
+    if languages:
+        langid.set_languages(languages)
+
+
+class ContentCache:
+    """
+    LRU cache keyed by a hash of the message text.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text):
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, text):
+        key = self.key(text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, text, value):
+        self._entries[self.key(text)] = value
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+language_cache = ContentCache()
+translation_cache = ContentCache()
+model_output_cache = ContentCache()
+
+
+def detect_languages(texts):
+    """
+    Returns the language code of each text, reusing cached results.
+    """
+    languages = []
+    for text in texts:
+        lang = language_cache.get(text)
+        if lang is None:
+            try:
+                lang = langid.classify(text)[0]
+            except Exception:
+                lang = "unknown"
+            language_cache.put(text, lang)
+        languages.append(lang)
+    return languages
+
+
+def translate_locally(texts, batch_size=16):
+    """
+    Translates texts to English with the local translation model, translating
+    each distinct text once. Returns the input text where translation fails.
+    """
+    results = [translation_cache.get(text) for text in texts]
+    pending = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+    if pending:
+        translator = registry.get("local_translator")
+        if translator is None:
+            return [result or text for text, result in zip(texts, results)]
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            try:
+                outputs = translator(chunk, batch_size=len(chunk), truncation=True)
+            except Exception as e:
+                print(f"Error translating text: {e}")
+                outputs = [{"translation_text": text} for text in chunk]
+            for text, output in zip(chunk, outputs):
+                translation_cache.put(text, output["translation_text"])
+        results = [translation_cache.get(text) for text in texts]
+    return [result or text for text, result in zip(texts, results)]
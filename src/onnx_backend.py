@@ -0,0 +1,232 @@
+import json
+import os
+import re
+
+import numpy as np
+
+PARITY_SENTENCES = [
+    "Guaranteed profit of 300% in one week, no risk at all!",
+    "Send 0.1 BTC to this wallet and get double your money back.",
+    "Bitcoin is trading sideways today, volume is thin.",
+    "I lost everything on this platform, withdrawals never arrive.",
+    "Reminder: admins will never DM you first.",
+    "Limited time offer: exclusive tokens for early members.",
+    "What a great community, thanks for the market recap!",
+    "This exchange froze my account and support ignores me.",
+    # Longer than 128 tokens, so a wrong truncation length fails the check.
+    " ".join([
+        "Welcome to the official VIP crypto signals group, where our team of professional traders shares",
+        "daily entries, exits and stop losses for Bitcoin, Ethereum and the most promising new altcoins.",
+    ] * 4),
+]
+
+# Bumped whenever the parity check gets stricter, so cached passes are redone.
+PARITY_VERSION = 2
+
+# Sequence length of sentence-transformers models without a config.
+DEFAULT_MAX_SEQ_LENGTH = 128
+
+
+def _model_dir(cache_dir, model_name):
+    return os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+
+
+def export_model(model_name, task, cache_dir="onnx_models", quantize=False):
+    """
+    Exports a Hugging Face model to ONNX (and optionally a dynamically
+    int8-quantized copy) unless the artifacts are already cached on disk.
+    `task` is "sentiment" (sequence classification logits) or "embedding"
+    (last hidden state). Returns the path of the requested .onnx file.
+    """
+    model_dir = _model_dir(cache_dir, model_name)
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+
+    if not os.path.isfile(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+        os.makedirs(model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if task == "sentiment":
+            model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            output_names = ["logits"]
+            dynamic_axes = {"logits": {0: "batch"}}
+            with open(os.path.join(model_dir, "labels.json"), "w") as labels_file:
+                json.dump({int(k): v for k, v in model.config.id2label.items()}, labels_file)
+        else:
+            model = AutoModel.from_pretrained(model_name)
+            output_names = ["last_hidden_state"]
+            dynamic_axes = {"last_hidden_state": {0: "batch", 1: "sequence"}}
+            _save_sentence_config(model_name, model_dir)
+        model.config.return_dict = False
+        model.eval()
+        tokenizer.save_pretrained(model_dir)
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        for name in input_names:
+            dynamic_axes[name] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        print(f"Exported {model_name} to {fp32_path}.")
+
+    if quantize and not os.path.isfile(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Quantized {model_name} to {int8_path}.")
+
+    return int8_path if quantize else fp32_path
+
+
+def _save_sentence_config(model_name, model_dir):
+    """
+    Copies the model's sentence-transformers config, which holds the
+    `max_seq_length` SentenceTransformer truncates to.
+    """
+    try:
+        from huggingface_hub import hf_hub_download
+        with open(hf_hub_download(model_name, "sentence_bert_config.json")) as config_file:
+            sentence_config = json.load(config_file)
+    except Exception as e:
+        print(f"No sentence-transformers config for {model_name}, using {DEFAULT_MAX_SEQ_LENGTH} tokens: {e}")
+        sentence_config = {"max_seq_length": DEFAULT_MAX_SEQ_LENGTH}
+    with open(os.path.join(model_dir, "sentence_bert_config.json"), "w") as config_file:
+        json.dump(sentence_config, config_file)
+
+
+class _OnnxModel:
+    def __init__(self, onnx_path, threads=None, max_length=256):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.model_dir = os.path.dirname(onnx_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_length = max_length
+
+    def _run(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        return self.session.run(None, feeds)[0], encoded["attention_mask"]
+
+
+class OnnxSentimentPipeline(_OnnxModel):
+    """
+    Drop-in replacement for the transformers sentiment pipeline call.
+    """
+
+    def __init__(self, onnx_path, threads=None, max_length=512):
+        super().__init__(onnx_path, threads, max_length)
+        with open(os.path.join(self.model_dir, "labels.json")) as labels_file:
+            self.labels = {int(k): v for k, v in json.load(labels_file).items()}
+
+    def __call__(self, texts, batch_size=32, truncation=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            logits, _ = self._run(texts[start:start + batch_size])
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities = exp / exp.sum(axis=1, keepdims=True)
+            for row in probabilities:
+                best = int(row.argmax())
+                results.append({"label": self.labels[best], "score": float(row[best])})
+        return results
+
+
+class OnnxSentenceEncoder(_OnnxModel):
+    """
+    Drop-in replacement for SentenceTransformer.encode with mean pooling,
+    matching paraphrase-MiniLM-L6-v2's pooling configuration. Texts are
+    truncated to the model's `max_seq_length`, as SentenceTransformer does.
+    """
+
+    def __init__(self, onnx_path, threads=None, max_length=None):
+        if max_length is None:
+            max_length = DEFAULT_MAX_SEQ_LENGTH
+            try:
+                with open(os.path.join(os.path.dirname(onnx_path), "sentence_bert_config.json")) as config_file:
+                    max_length = json.load(config_file).get("max_seq_length") or max_length
+            except FileNotFoundError:
+                pass
+        super().__init__(onnx_path, threads, max_length)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            hidden, mask = self._run(sentences[start:start + batch_size])
+            mask = mask[..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        embeddings = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def check_parity(task, reference, candidate, sentences=PARITY_SENTENCES, max_score_delta=0.05, min_cosine=0.99):
+    """
+    Compares a candidate backend against the PyTorch reference. Sentiment must
+    agree on every label within `max_score_delta`; embeddings must reach
+    `min_cosine` similarity. Returns `(passed, report)`.
+    """
+    if task == "sentiment":
+        expected = reference(sentences)
+        actual = candidate(sentences)
+        label_agreement = float(np.mean([e["label"] == a["label"] for e, a in zip(expected, actual)]))
+        score_delta = float(max(abs(e["score"] - a["score"]) for e, a in zip(expected, actual)))
+        report = {"label_agreement": label_agreement, "max_score_delta": score_delta}
+        return label_agreement == 1.0 and score_delta <= max_score_delta, report
+
+    expected = np.asarray(reference.encode(sentences, convert_to_numpy=True), dtype=np.float32)
+    actual = np.asarray(candidate.encode(sentences, convert_to_numpy=True), dtype=np.float32)
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1) + 1e-9
+    )
+    report = {"min_cosine": float(cosine.min())}
+    return report["min_cosine"] >= min_cosine, report
+
+
+def load_onnx_model(task, model_name, load_reference, quantize=False, threads=None, cache_dir="onnx_models"):
+    """
+    Returns an ONNX Runtime model for `task`. Every backend must pass the
+    parity check against the PyTorch model before it is used: a quantized
+    model that fails falls back to full-precision ONNX, and that falls back
+    to the PyTorch model itself.
+    """
+    model_class = OnnxSentimentPipeline if task == "sentiment" else OnnxSentenceEncoder
+    reference = None
+    for use_int8 in ([True, False] if quantize else [False]):
+        try:
+            candidate = model_class(export_model(model_name, task, cache_dir, quantize=use_int8), threads=threads)
+            marker = os.path.join(_model_dir(cache_dir, model_name),
+                                  f"parity{'.int8' if use_int8 else ''}.v{PARITY_VERSION}.json")
+            if os.path.isfile(marker):
+                with open(marker) as marker_file:
+                    if json.load(marker_file).get("passed"):
+                        return candidate
+            if reference is None:
+                reference = load_reference()
+            passed, report = check_parity(task, reference, candidate)
+            with open(marker, "w") as marker_file:
+                json.dump({"passed": passed, **report}, marker_file)
+            print(f"Parity check for {model_name} ({'int8' if use_int8 else 'fp32'} ONNX): {report}")
+            if passed:
+                return candidate
+        except Exception as e:
+            print(f"Error loading ONNX model for {model_name}: {e}")
+    print(f"Falling back to the PyTorch backend for {model_name}.")
+    return reference if reference is not None else load_reference()
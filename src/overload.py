@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+from metrics import load_shedding
+
+SHED_STAGES = ("sentiment", "similarity")
+
+
+class OverloadController:
+    """
+    Deadline-aware load shedding in front of analyze_message.
+
+    Each message is admitted on arrival and finished when its analysis
+    completes. The controller is behind when the oldest unfinished message
+    is older than `latency_target` seconds while at least `min_backlog`
+    messages are in flight, so one slow lookup on a quiet day does not
+    count. While behind, messages from channels with fewer than
+    `priority_min_flagged` flagged messages skip `shed_stages`; those the
+    cheap stages do not flag are queued (up to `max_deferred`, oldest
+    dropped first) and analysed in full once the backlog has cleared.
+    Channels are keyed by marked peer id, which, unlike the title, is
+    unique and stable. Every decision is counted in the
+    scambot_load_shedding_total metric.
+    """
+
+    def __init__(self, latency_target=2.0, min_backlog=8, priority_min_flagged=1, max_deferred=10000,
+                 shed_stages=SHED_STAGES, enabled=True):
+        self.latency_target = latency_target
+        self.min_backlog = min_backlog
+        self.priority_min_flagged = priority_min_flagged
+        self.max_deferred = max_deferred
+        self.shed_stages = tuple(shed_stages)
+        self.enabled = enabled
+        self.flagged_counts = {}
+        self.deferred = deque()
+        self.counts = {decision: 0 for decision in ("full", "priority", "shed", "deferred", "dropped", "recovered",
+                                                    "paused")}
+        self._pending = OrderedDict()
+        self._next_token = 0
+
+    def _count(self, decision):
+        self.counts[decision] += 1
+        load_shedding.inc(decision=decision)
+
+    def load_history(self, counts):
+        """
+        Seeds channel priorities from `{channel id: flagged messages}`.
+        """
+        for channel, count in counts.items():
+            self.flagged_counts[channel] = self.flagged_counts.get(channel, 0) + count
+
+    def record_flagged(self, channel):
+        self.flagged_counts[channel] = self.flagged_counts.get(channel, 0) + 1
+
+    def is_priority(self, channel):
+        return self.flagged_counts.get(channel, 0) >= self.priority_min_flagged
+
+    def admit(self):
+        """
+        Registers an arriving message; pass the returned token to finish().
+        """
+        token = self._next_token
+        self._next_token += 1
+        self._pending[token] = time.monotonic()
+        return token
+
+    def finish(self, token):
+        self._pending.pop(token, None)
+
+    def backlog(self):
+        return len(self._pending)
+
+    def oldest_age(self):
+        if not self._pending:
+            return 0.0
+        return time.monotonic() - next(iter(self._pending.values()))
+
+    def behind(self):
+        return (self.enabled and len(self._pending) >= self.min_backlog
+                and self.oldest_age() >= self.latency_target)
+
+    async def wait_until_caught_up(self, poll_interval=0.5):
+        """
+        Waits while the controller is behind, so background work such as
+        the history backfill never competes with live messages.
+        """
+        paused = False
+        while self.behind():
+            if not paused:
+                self._count("paused")
+                paused = True
+            await asyncio.sleep(poll_interval)
+
+    def idle(self):
+        """
+        True when there is headroom for deferred work: a short backlog and
+        no message older than half the latency target.
+        """
+        return len(self._pending) < self.min_backlog and self.oldest_age() < self.latency_target / 2
+
+    def decide(self, channel):
+        """
+        Returns the stages to skip for a message from `channel`: none for
+        full analysis, `shed_stages` when the message is shed.
+        """
+        if not self.behind():
+            self._count("full")
+            return ()
+        if self.is_priority(channel):
+            self._count("priority")
+            return ()
+        self._count("shed")
+        return self.shed_stages
+
+    def defer(self, channel, channel_name, message_text):
+        """
+        Queues a shed message for full analysis once the backlog clears.
+        """
+        if len(self.deferred) >= self.max_deferred:
+            self.deferred.popleft()
+            self._count("dropped")
+        self.deferred.append((channel, channel_name, message_text))
+        self._count("deferred")
+
+    async def run_deferred(self, analyze, batch_size=8, idle_interval=1.0):
+        """
+        Re-analyses deferred messages at full depth whenever the controller
+        is idle, `batch_size` at a time. `analyze(channel, channel_name,
+        message_text)` is awaited for each message.
+        """
+        while True:
+            if not self.deferred or not self.idle():
+                await asyncio.sleep(idle_interval)
+                continue
+            batch = [self.deferred.popleft() for _ in range(min(batch_size, len(self.deferred)))]
+            tokens = [self.admit() for _ in batch]
+            try:
+                results = await asyncio.gather(
+                    *(analyze(*message) for message in batch), return_exceptions=True
+                )
+            finally:
+                for token in tokens:
+                    self.finish(token)
+            for (_, channel_name, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    print(f"Error analyzing deferred message from {channel_name}: {result}")
+                else:
+                    self._count("recovered")
+
+    def stats(self):
+        return {
+            **self.counts,
+            "backlog": self.backlog(),
+            "oldest_age_seconds": self.oldest_age(),
+            "deferred_queue": len(self.deferred),
+            "priority_channels": sum(1 for channel in self.flagged_counts if self.is_priority(channel)),
+        }
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import re
+import numpy as np
+
+
+class PhraseEmbeddingStore:
+    """
+    Holds the embeddings of the reference scam phrases.
+
+    The phrases are encoded once, L2-normalised and cached on disk as a .npy
+    file keyed by model name and a hash of the phrase list, so restarts only
+    memory-map the matrix instead of re-running the encoder.
+    """
+
+    def __init__(self, model, model_name, phrases, cache_dir="embeddings_cache"):
+        self.model = model
+        self.model_name = model_name
+        self.phrases = list(phrases)
+        self.cache_dir = cache_dir
+        self.matrix = None
+
+    def cache_path(self):
+        """
+        Returns the cache file path for the current model and phrase list.
+        """
+        digest = hashlib.sha256("\n".join(self.phrases).encode("utf-8")).hexdigest()[:16]
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_name)
+        return os.path.join(self.cache_dir, f"{safe_name}-{digest}.npy")
+
+    def load_or_build(self):
+        """
+        Loads the phrase matrix from disk, encoding and saving it if missing.
+        """
+        path = self.cache_path()
+        if os.path.isfile(path):
+            try:
+                self.matrix = np.load(path, mmap_mode="r")
+                if self.matrix.shape[0] == len(self.phrases):
+                    return self.matrix
+            except Exception as e:
+                print(f"Error loading phrase embeddings from {path}: {e}")
+
+        embeddings = self.model.encode(self.phrases, batch_size=64, convert_to_numpy=True)
+        self.matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(path, self.matrix)
+        except Exception as e:
+            print(f"Error saving phrase embeddings to {path}: {e}")
+        return self.matrix
+
+    def similarities(self, message_embeddings):
+        """
+        Returns the cosine similarity matrix (messages x phrases).
+        Accepts a single embedding or a 2-D batch of embeddings.
+        """
+        if self.matrix is None:
+            self.load_or_build()
+        embeddings = np.atleast_2d(np.asarray(message_embeddings, dtype=np.float32))
+        return normalize_rows(embeddings) @ self.matrix.T
+
+    def max_similarity(self, message_embeddings):
+        """
+        Returns the highest phrase similarity for each message embedding.
+        """
+        if not self.phrases:
+            return np.zeros(np.atleast_2d(message_embeddings).shape[0], dtype=np.float32)
+        return self.similarities(message_embeddings).max(axis=1)
+
+
+def normalize_rows(matrix):
+    """
+    L2-normalises each row of a 2-D array, leaving zero rows untouched.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,183 @@
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+DEFAULT_MODEL_PATH = "prefilter.joblib"
+
+
+def build_pipeline():
+    """
+    Hashed word and character n-grams feeding a logistic-regression SGD
+    model. The hashing vectorizers are stateless, so the saved model is just
+    the weight vector and loads in milliseconds.
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline, make_union
+
+    features = make_union(
+        HashingVectorizer(ngram_range=(1, 2), n_features=2 ** 18, alternate_sign=False),
+        HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), n_features=2 ** 18, alternate_sign=False),
+    )
+    classifier = SGDClassifier(loss="log_loss", alpha=1e-5, class_weight="balanced", random_state=0)
+    return make_pipeline(features, classifier)
+
+
+class Prefilter:
+    """
+    First-stage scam classifier. Messages whose scam probability is below
+    `clear_below` are cleared without running the transformer models.
+    """
+
+    def __init__(self, pipeline, clear_below=0.05, info=None):
+        self.pipeline = pipeline
+        self.clear_below = clear_below
+        self.info = info or {}
+
+    def scores(self, texts):
+        """
+        Returns the scam probability of each text in one vectorized pass.
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        return self.pipeline.predict_proba(list(texts))[:, 1].astype(np.float32)
+
+    def clears(self, score):
+        return score is not None and score < self.clear_below
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        import joblib
+        joblib.dump({"pipeline": self.pipeline, "clear_below": self.clear_below, "info": self.info}, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH, clear_below=None):
+        """
+        Loads a trained model, or returns None when none has been trained.
+        `clear_below` overrides the threshold chosen at training time.
+        """
+        if not os.path.isfile(path):
+            return None
+        import joblib
+        bundle = joblib.load(path)
+        threshold = clear_below if clear_below is not None else bundle["clear_below"]
+        return cls(bundle["pipeline"], threshold, bundle.get("info"))
+
+
+def clear_threshold(scores, labels, min_recall=0.99):
+    """
+    Returns the highest threshold that still keeps `min_recall` of the scams
+    at or above it, i.e. the most messages the pre-filter can clear while
+    missing at most 1 - `min_recall` of the held-out scams.
+    """
+    scam_scores = np.sort(scores[labels == 1])
+    if len(scam_scores) == 0:
+        return 0.0
+    return float(scam_scores[int(np.floor(len(scam_scores) * (1 - min_recall)))])
+
+
+def train(texts, labels, min_recall=0.99, holdout=0.2, seed=0):
+    """
+    Fits the pre-filter, picks the clear threshold on a held-out split, then
+    refits on all data. Returns the trained Prefilter.
+    """
+    texts = list(texts)
+    labels = np.asarray(labels, dtype=np.int64)
+    if len(set(labels.tolist())) < 2:
+        raise ValueError("Training data needs both scam and benign messages.")
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(texts))
+    split = int(len(texts) * (1 - holdout))
+    train_ids, test_ids = order[:split], order[split:]
+
+    pipeline = build_pipeline()
+    pipeline.fit([texts[i] for i in train_ids], labels[train_ids])
+    scores = pipeline.predict_proba([texts[i] for i in test_ids])[:, 1]
+    threshold = clear_threshold(scores, labels[test_ids], min_recall)
+    cleared = scores < threshold
+    info = {
+        "trained": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "samples": len(texts),
+        "scams": int(labels.sum()),
+        "holdout_cleared": float(cleared[labels[test_ids] == 0].mean()) if (labels[test_ids] == 0).any() else 0.0,
+        "holdout_scam_recall": float((~cleared[labels[test_ids] == 1]).mean()) if (labels[test_ids] == 1).any() else 1.0,
+    }
+
+    pipeline = build_pipeline()
+    pipeline.fit(texts, labels)
+    return Prefilter(pipeline, threshold, info)
+
+
+def read_messages(path):
+    """
+    Reads messages from a .txt file (one per line) or a CSV with a
+    "Message Text" column.
+    """
+    with open(path, newline="", encoding="utf-8") as messages_file:
+        if path.endswith(".csv"):
+            return [row["Message Text"] for row in csv.DictReader(messages_file) if row.get("Message Text")]
+        return [line.strip() for line in messages_file if line.strip()]
+
+
+def read_labelled(path):
+    """
+    Reads a CSV with "Message Text" and "Label" columns (1 = scam, 0 = benign).
+    """
+    texts, labels = [], []
+    with open(path, newline="", encoding="utf-8") as labelled_file:
+        for row in csv.DictReader(labelled_file):
+            if row.get("Message Text") and row.get("Label") not in (None, ""):
+                texts.append(row["Message Text"])
+                labels.append(int(row["Label"]))
+    return texts, labels
+
+
+def read_flagged(db_path):
+    from flagged_store import connect
+    connection = connect(db_path)
+    try:
+        return [row[0] for row in connection.execute("SELECT DISTINCT message FROM flagged_messages")]
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train or apply the first-stage scam pre-filter.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train_parser = subcommands.add_parser("train", help="Train the pre-filter.")
+    train_parser.add_argument("--db", help="Flagged message database; its messages are used as scams.")
+    train_parser.add_argument("--scams", help="Extra scam messages (.txt or flagged CSV).")
+    train_parser.add_argument("--benign", help="Benign messages (.txt or CSV with a 'Message Text' column).")
+    train_parser.add_argument("--labelled", help="CSV with 'Message Text' and 'Label' (1 = scam, 0 = benign).")
+    train_parser.add_argument("--min-recall", type=float, default=0.99,
+                              help="Share of held-out scams that must not be cleared.")
+    score_parser = subcommands.add_parser("score", help="Score messages in a batch.")
+    score_parser.add_argument("messages", help=".txt file (one message per line) or CSV.")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        texts, labels = [], []
+        if args.labelled:
+            texts, labels = read_labelled(args.labelled)
+        scams = (read_flagged(args.db) if args.db else []) + (read_messages(args.scams) if args.scams else [])
+        benign = read_messages(args.benign) if args.benign else []
+        texts += scams + benign
+        labels += [1] * len(scams) + [0] * len(benign)
+        prefilter = train(texts, labels, min_recall=args.min_recall)
+        prefilter.save(args.model)
+        print(f"Saved pre-filter to {args.model} (clear below {prefilter.clear_below:.4f}): {prefilter.info}")
+    else:
+        prefilter = Prefilter.load(args.model)
+        if prefilter is None:
+            raise SystemExit(f"No pre-filter model at {args.model}.")
+        messages = read_messages(args.messages)
+        started = time.perf_counter()
+        scores = prefilter.scores(messages)
+        elapsed = time.perf_counter() - started
+        for message, score in zip(messages, scores):
+            print(f"{score:.4f}\t{'clear' if prefilter.clears(score) else 'check'}\t{message[:100]}")
+        print(f"Scored {len(messages)} messages in {elapsed * 1000:.1f} ms.")
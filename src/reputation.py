@@ -0,0 +1,244 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+
+class VerdictCache:
+    """
+    TTL + LRU cache of reputation verdicts, optionally backed by a SQLite file
+    so verdicts survive restarts.
+
+    Verdicts are written to SQLite right away but committed at most every
+    `commit_interval` seconds or `commit_batch` verdicts, so the event loop
+    does not wait for a disk sync per verdict. Uncommitted verdicts are lost
+    on a crash, which only costs a repeated lookup.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600, path=None, commit_interval=1.0, commit_batch=100):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER, expires REAL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"Error opening verdict cache {path}: {e}")
+                self._db = None
+
+    def get(self, key):
+        """
+        Returns the cached verdict for `key`, or None if missing or expired.
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            verdict, expires = entry
+            if expires > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return verdict
+            del self._entries[key]
+        if self._db is not None:
+            row = self._db.execute("SELECT verdict, expires FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                self._remember(key, bool(row[0]), row[1])
+                self.hits += 1
+                return bool(row[0])
+        self.misses += 1
+        return None
+
+    def set(self, key, verdict):
+        expires = time.time() + self.ttl
+        self._remember(key, verdict, expires)
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, verdict, expires) VALUES (?, ?, ?)",
+                    (key, int(verdict), expires),
+                )
+                self._uncommitted += 1
+                if self._uncommitted >= self.commit_batch or \
+                        time.monotonic() - self._committed_at >= self.commit_interval:
+                    self.commit()
+            except Exception as e:
+                print(f"Error writing verdict cache: {e}")
+
+    def commit(self):
+        self._committed_at = time.monotonic()
+        if self._db is not None and self._uncommitted:
+            self._uncommitted = 0
+            self._db.commit()
+
+    def _remember(self, key, verdict, expires):
+        self._entries[key] = (verdict, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def close(self):
+        if self._db is not None:
+            try:
+                self.commit()
+            except Exception as e:
+                print(f"Error writing verdict cache: {e}")
+            self._db.close()
+            self._db = None
+
+
+class RateLimiter:
+    """
+    Token bucket limiting requests per second to one endpoint.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ReputationClient:
+    """
+    Async client for the phishing URL and scam wallet APIs.
+
+    Uses one pooled aiohttp session, checks every URL and wallet of a message
+    concurrently, applies per-endpoint timeouts and rate limits, and caches
+    verdicts. Concurrent lookups of the same key share one request. With a
+    local `blocklist` (an index, or a callable returning one or None, looked
+    up on every check), listed indicators are flagged without a request and
+    the APIs are only asked about blocklist misses (never, if `remote` is
+    False).
+    """
+
+    def __init__(self, phishing_api, wallet_api, cache_size=10000, cache_ttl=3600,
+                 cache_path=None, url_timeout=5, wallet_timeout=5,
+                 url_rate=10, wallet_rate=10, max_connections=20, blocklist=None, remote=True):
+        self.endpoints = {
+            "url": (phishing_api, "url", "is_phishing", aiohttp.ClientTimeout(total=url_timeout), RateLimiter(url_rate)),
+            "wallet": (wallet_api, "wallet", "scam", aiohttp.ClientTimeout(total=wallet_timeout), RateLimiter(wallet_rate)),
+        }
+        self.cache = VerdictCache(maxsize=cache_size, ttl=cache_ttl, path=cache_path)
+        self.max_connections = max_connections
+        self.blocklist = blocklist
+        self.remote = remote
+        self.blocklist_hits = 0
+        self.errors = 0
+        self._session = None
+        self._pending = {}
+
+    async def start(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.cache.close()
+
+    def _blocklist(self):
+        return self.blocklist() if callable(self.blocklist) else self.blocklist
+
+    async def check_url(self, url):
+        blocklist = self._blocklist()
+        if blocklist is not None and blocklist.check_url(url):
+            self.blocklist_hits += 1
+            return True
+        return await self._lookup("url", url) if self.remote else False
+
+    async def check_wallet(self, wallet):
+        blocklist = self._blocklist()
+        if blocklist is not None and blocklist.check_wallet(wallet):
+            self.blocklist_hits += 1
+            return True
+        return await self._lookup("wallet", wallet) if self.remote else False
+
+    async def check_message(self, urls, wallets):
+        """
+        Returns `(url_flags, wallet_flags)` for all indicators of one message.
+        """
+        results = await asyncio.gather(
+            *(self.check_url(url) for url in set(urls)),
+            *(self.check_wallet(wallet) for wallet in set(wallets)),
+        )
+        url_count = len(set(urls))
+        return any(results[:url_count]), any(results[url_count:])
+
+    async def _lookup(self, kind, value):
+        key = f"{kind}:{value}"
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            return verdict
+        if key in self._pending:
+            # Shielded, so a cancelled waiter does not cancel the shared lookup.
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            verdict = await self._request(kind, value)
+            if verdict is not None:
+                self.cache.set(key, verdict)
+            future.set_result(bool(verdict))
+            return bool(verdict)
+        finally:
+            # Cancelled or failed: the waiters get no verdict, like an API error.
+            if not future.done():
+                future.set_result(False)
+            del self._pending[key]
+
+    async def _request(self, kind, value):
+        endpoint, field, result_field, timeout, limiter = self.endpoints[kind]
+        if self._session is None:
+            await self.start()
+        await limiter.acquire()
+        try:
+            async with self._session.post(endpoint, json={field: value}, timeout=timeout) as response:
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    return bool(data.get(result_field, False))
+                return None
+        except Exception as e:
+            self.errors += 1
+            print(f"Error checking {kind} reputation: {e}")
+            return None
+
+    def stats(self):
+        return {
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_size": len(self.cache._entries),
+            "blocklist_hits": self.blocklist_hits,
+            "errors": self.errors,
+        }
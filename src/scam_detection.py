@@ -1,30 +1,20 @@
 import csv
 import os
 import re
-from datetime import datetime
-from telethon import TelegramClient, functions, types
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
 from langid import classify  
-from rapidfuzz import fuzz  
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
 import requests
-import easyocr
-from googletrans import Translator
 import json
-
-try:
-    nlp_model = SentenceTransformer("sentence-transformers/paraphrase-MiniLM-L6-v2")  # Updated with the correct model path
-except Exception as e:
-    print(f"Error loading SentenceTransformer model: {e}")
-    nlp_model = None
-
-sentiment_model = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-translator = Translator()
-
-vectorizer = TfidfVectorizer()
-ml_classifier = RandomForestClassifier()
+import time
+from phrase_store import PhraseEmbeddingStore
+from scam_index import ScamVectorIndex
+from prefilter import Prefilter
+from blocklist import BlocklistIndex
+from indicators import extract_indicators
+from keyword_index import KeywordIndex
+from model_registry import registry, configure_backend, EMBEDDING_MODEL_NAME, MULTILINGUAL_EMBEDDING_MODEL_NAME
+from metrics import stages_skipped
+from scoring import CascadeScorer, ScoringStage
+from multilingual import use_offline_models, restrict_languages, detect_languages, translate_locally
 
 SCAM_KEYWORDS = [
     "guaranteed profit", "100% return", "double your money",
@@ -34,11 +24,27 @@ SCAM_KEYWORDS = [
     "trusted platform", "regulated broker", "withdrawal problems"
 ]
 
+SUSPICIOUS_PHRASES = [
+    "guaranteed profit", "double your money", "investment opportunity",
+    "100% return", "no risk", "get rich quick", "limited time offer"
+]
+
+
+def _phrase_store_loader(embedding_name, model_name):
+    def load():
+        nlp_model = registry.get(embedding_name)
+        if nlp_model is None:
+            raise RuntimeError(f"{embedding_name} model is unavailable")
+        phrase_store = PhraseEmbeddingStore(nlp_model, model_name, SUSPICIOUS_PHRASES)
+        phrase_store.load_or_build()
+        return phrase_store
+    return load
+
+
+
 PHISHING_API = "https://api.phishtank.com/check-url" 
 WALLET_VERIFICATION_API = "https://api.scamwallet.com/check"  
 
-import json
-
 with open("config.json", "r") as config_file:
     config = json.load(config_file)
 
@@ -49,14 +55,76 @@ if not BOT_TOKEN:
 
 TELEGRAM_REPORT_API = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
 
+configure_backend(
+    config.get("settings", {}).get("inference_backend", "pytorch"),
+    threads=config.get("settings", {}).get("inference_threads"),
+)
+registry.register(
+    "phrase_store",
+    _phrase_store_loader("embedding", f"{EMBEDDING_MODEL_NAME}-{registry.backend}"),
+)
+registry.register(
+    "multilingual_phrase_store",
+    _phrase_store_loader("multilingual_embedding", MULTILINGUAL_EMBEDDING_MODEL_NAME),
+)
+
+# Embeddings of confirmed scams, built from the flagged messages. Only the
+# English embedding model feeds it.
+SCAM_INDEX_PATH = config.get("settings", {}).get("scam_index_path", "scam_index")
+SCAM_INDEX_K = config.get("settings", {}).get("scam_index_k", 5)
+registry.register("scam_index", lambda: ScamVectorIndex(
+    SCAM_INDEX_PATH, campaign_threshold=config.get("settings", {}).get("campaign_similarity", 0.9)
+))
+
+# Local blocklist built with `python src/blocklist.py`; the remote APIs are
+# only asked about indicators it does not list.
+registry.register("blocklist", lambda: BlocklistIndex.load(
+    config.get("settings", {}).get("blocklist_path", "blocklist")
+))
+REMOTE_REPUTATION = config.get("settings", {}).get("remote_reputation", True)
+URL_CHECK_TIMEOUT = config.get("settings", {}).get("url_check_timeout", 5)
+WALLET_CHECK_TIMEOUT = config.get("settings", {}).get("wallet_check_timeout", 5)
+
+# Hashed n-gram classifier trained with `python src/prefilter.py train`.
+# English messages it clears skip the transformer stages.
+registry.register("prefilter", lambda: Prefilter.load(
+    config.get("settings", {}).get("prefilter_path", "prefilter.joblib"),
+    config.get("settings", {}).get("prefilter_clear_below"),
+))
+MODEL_STAGES = ("sentiment", "similarity")
+
+KEYWORDS_FILE = config.get("settings", {}).get("keywords_file", "scam_keywords.txt")
+keyword_index = KeywordIndex(SCAM_KEYWORDS, path=KEYWORDS_FILE)
+
+# Multilingual mode scores non-English messages with local multilingual
+# models instead of dropping them.
+MULTILINGUAL = config.get("settings", {}).get("multilingual", False)
+if MULTILINGUAL:
+    if config.get("settings", {}).get("offline_models", True):
+        use_offline_models()
+    restrict_languages(config.get("settings", {}).get("languages"))
+
+ENGLISH_MODELS = {
+    "sentiment_model": "sentiment",
+    "embedding_model": "embedding",
+    "phrase_store": "phrase_store",
+    "scam_index": "scam_index",
+}
+MULTILINGUAL_MODELS = {
+    "sentiment_model": "multilingual_sentiment",
+    "embedding_model": "multilingual_embedding",
+    "phrase_store": "multilingual_phrase_store",
+    "scam_index": None,
+}
+NEGATIVE_LABELS = {"NEGATIVE", "NEG", "LABEL_0"}
+
 if __name__ == "__main__":
     print(f"API URL: {TELEGRAM_REPORT_API}")
 
 
 def extract_text_from_image(image_data):
     try:
-        reader = easyocr.Reader(['en'])
-        result = reader.readtext(image_data)
+        result = registry.get("ocr").readtext(image_data)
         extracted_text = " ".join([text[1] for text in result])
         return extracted_text
     except Exception as e:
@@ -67,8 +135,10 @@ def extract_text_from_image(image_data):
 def translate_to_english(text):
     try:
         lang, _ = classify(text)
+        if lang != "en" and MULTILINGUAL:
+            return translate_locally([text])[0]
         if lang != "en":
-            translated = translator.translate(text, src=lang, dest="en")
+            translated = registry.get("translator").translate(text, src=lang, dest="en")
             return translated.text
         return text
     except Exception as e:
@@ -77,8 +147,13 @@ def translate_to_english(text):
 
 
 def check_wallet_address(wallet):
+    blocklist = registry.get("blocklist")
+    if blocklist is not None and blocklist.check_wallet(wallet):
+        return True
+    if not REMOTE_REPUTATION:
+        return False
     try:
-        response = requests.post(WALLET_VERIFICATION_API, json={"wallet": wallet})
+        response = requests.post(WALLET_VERIFICATION_API, json={"wallet": wallet}, timeout=WALLET_CHECK_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             return data.get("scam", False)
@@ -89,8 +164,13 @@ def check_wallet_address(wallet):
 
 
 def inspect_url(url):
+    blocklist = registry.get("blocklist")
+    if blocklist is not None and blocklist.check_url(url):
+        return True
+    if not REMOTE_REPUTATION:
+        return False
     try:
-        response = requests.post(PHISHING_API, json={"url": url})
+        response = requests.post(PHISHING_API, json={"url": url}, timeout=URL_CHECK_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             return data.get("is_phishing", False)
@@ -100,11 +180,28 @@ def inspect_url(url):
         return False
 
 
-def is_keyword_match(message_text, keywords, threshold=85):
-    for keyword in keywords:
-        if fuzz.partial_ratio(message_text.lower(), keyword.lower()) >= threshold:  
-            return True
-    return False
+def extract_urls(message_text):
+    return extract_indicators(message_text)[0]
+
+
+def extract_wallets(message_text):
+    """
+    Returns the checksum-valid Bitcoin, Ethereum and TRON addresses.
+    """
+    return extract_indicators(message_text)[1]
+
+
+def find_keyword_matches(message_text, keywords=None, threshold=85):
+    """
+    Returns the keywords found in a message with their positions. Uses the
+    compiled keyword index unless an explicit keyword list is given.
+    """
+    index = keyword_index if keywords is None else KeywordIndex(keywords, threshold=threshold)
+    return index.find(message_text)
+
+
+def is_keyword_match(message_text, keywords=None, threshold=85):
+    return bool(find_keyword_matches(message_text, keywords, threshold))
 
 
 def detect_language(message):
@@ -130,52 +227,216 @@ def explain_risk_flags(message_text, flags):
     return explanations
 
 
-def analyze_message(message_text):
-
-    lang = detect_language(message_text)
-    if lang != "en":
-        return None, "Unsupported Language"
-   
-    urls = re.findall(r'https?://\S+', message_text)
-    wallets = re.findall(r'[13][a-km-zA-HJ-NP-Z1-9]{25,34}', message_text)  
-
-    url_flags = any(inspect_url(url) for url in urls)
-    wallet_flags = any(check_wallet_address(wallet) for wallet in wallets)
-    
-    keyword_flag = is_keyword_match(message_text, SCAM_KEYWORDS)
-   
-    sentiment = sentiment_model(message_text)[0]
-    sentiment_flag = sentiment["label"] == "NEGATIVE" and sentiment["score"] > 0.8
-   
-    suspicious_phrases = [
-        "guaranteed profit", "double your money", "investment opportunity",
-        "100% return", "no risk", "get rich quick", "limited time offer"
-    ]
-    similarity_flag = any(
-        util.cos_sim(nlp_model.encode(message_text), nlp_model.encode(phrase)).item() > 0.8
-        for phrase in suspicious_phrases
-    ) if nlp_model else False
-
-    flags = []
-    if keyword_flag:
-        flags.append("Keyword Match")
-    if sentiment_flag:
-        flags.append("Negative Sentiment")
-    if similarity_flag:
-        flags.append("Semantic Match")
-    if url_flags:
-        flags.append("Suspicious URL")
-    if wallet_flags:
-        flags.append("Scam Wallet")
-   
-    scam_risk = (
-        (0.3 if keyword_flag else 0) +
-        (0.2 if sentiment_flag else 0) +
-        (0.2 if similarity_flag else 0) +
-        (0.15 if url_flags else 0) +
-        (0.15 if wallet_flags else 0)
+_stage_observer = None
+
+
+def set_stage_observer(observer):
+    """
+    Registers `observer(stage_name, seconds)`, called after each stage of
+    analyze_message. Pass None to disable stage timing.
+    """
+    global _stage_observer
+    _stage_observer = observer
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _stage_observer is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if _stage_observer is not None:
+            _stage_observer(self.name, time.perf_counter() - self.started)
+
+
+SENTIMENT_THRESHOLD = 0.8
+SIMILARITY_THRESHOLD = 0.8
+
+
+def _keyword_stage(context):
+    if context["keyword_flag"] is None:
+        context["keyword_hits"] = len(find_keyword_matches(context["text"]))
+        context["keyword_flag"] = context["keyword_hits"] > 0
+    return context["keyword_flag"]
+
+
+def _url_stage(context):
+    if context["url_flags"] is None:
+        context["url_flags"] = any(inspect_url(url) for url in extract_urls(context["text"]))
+    return context["url_flags"]
+
+
+def _wallet_stage(context):
+    if context["wallet_flags"] is None:
+        context["wallet_flags"] = any(check_wallet_address(wallet) for wallet in extract_wallets(context["text"]))
+    return context["wallet_flags"]
+
+
+def _sentiment_stage(context):
+    if context["sentiment"] is None:
+        sentiment_model = registry.get(context["models"]["sentiment_model"])
+        if sentiment_model is None:
+            return False
+        context["sentiment"] = sentiment_model(context["text"], truncation=True)[0]
+    sentiment = context["sentiment"]
+    return sentiment["label"].upper() in NEGATIVE_LABELS and sentiment["score"] > SENTIMENT_THRESHOLD
+
+
+def _similarity_stage(context):
+    if context["embedding"] is None:
+        nlp_model = registry.get(context["models"]["embedding_model"])
+        if nlp_model is None:
+            return False
+        context["embedding"] = nlp_model.encode(context["text"])
+    similarity = 0.0
+    phrase_store = registry.get(context["models"]["phrase_store"])
+    if phrase_store is not None:
+        similarity = float(phrase_store.max_similarity(context["embedding"])[0])
+        context["phrase_similarity"] = similarity
+    if context["models"]["scam_index"]:
+        scam_index = registry.get(context["models"]["scam_index"])
+        if scam_index is not None and scam_index.count:
+            context["knn_similarity"] = scam_index.knn_score(context["embedding"], SCAM_INDEX_K)
+            similarity = max(similarity, context["knn_similarity"])
+    context["similarity"] = similarity
+    return similarity > SIMILARITY_THRESHOLD
+
+
+# Declared in flag order; the scorer runs them cheapest first.
+SCORING_STAGES = [
+    ScoringStage("keywords", "Keyword Match", 0.3, 1, _keyword_stage),
+    ScoringStage("sentiment", "Negative Sentiment", 0.2, 50, _sentiment_stage),
+    ScoringStage("similarity", "Semantic Match", 0.2, 60, _similarity_stage),
+    ScoringStage("url_check", "Suspicious URL", 0.15, 5, _url_stage),
+    ScoringStage("wallet_check", "Scam Wallet", 0.15, 5, _wallet_stage),
+]
+
+# 0 keeps the original rule (any fired check alerts); 0.45 requires e.g. a
+# keyword match plus a URL or model hit.
+ALERT_THRESHOLD = config.get("settings", {}).get("alert_threshold", 0.0)
+scorer = CascadeScorer(SCORING_STAGES, ALERT_THRESHOLD, timer=_Stage)
+
+
+def is_alert(risk_score):
+    return scorer.is_alert(risk_score)
+
+
+def needs_model_stages(keyword_flag, url_flags, wallet_flags, lang="en"):
+    """
+    Returns False when the cheap signals already settle the alert decision,
+    so the sentiment and embedding models do not need to run. The keyword
+    list is English, so a non-English message without cheap hits always
+    needs the models.
+    """
+    return not scorer.is_settled(
+        {"keywords": keyword_flag, "url_check": url_flags, "wallet_check": wallet_flags}, prune=lang == "en"
     )
-    
+
+
+def prefilter_scores(texts):
+    """
+    Returns the pre-filter scam probability of each text in one batch, or
+    None for every text when no pre-filter has been trained.
+    """
+    prefilter = registry.get("prefilter")
+    if prefilter is None:
+        return [None] * len(texts)
+    with _Stage("prefilter"):
+        return prefilter.scores(texts).tolist()
+
+
+def prefilter_clears(score):
+    """
+    Returns True when the pre-filter score clears the message, so the
+    transformer stages can be skipped.
+    """
+    prefilter = registry.get("prefilter")
+    return prefilter is not None and prefilter.clears(score)
+
+
+def _verdict(flag):
+    return -1 if flag is None else int(bool(flag))
+
+
+def message_features(context):
+    """
+    Raw per-message features for the feature store. Values of stages that
+    did not run are -1 or NaN, so re-scoring can tell them from negatives.
+    """
+    sentiment = context["sentiment"]
+    keyword_hits = context.get("keyword_hits")
+    if keyword_hits is None:
+        keyword_hits = _verdict(context["keyword_flag"])
+    return {
+        "sentiment_label": -1 if sentiment is None else int(sentiment["label"].upper() in NEGATIVE_LABELS),
+        "sentiment_score": float("nan") if sentiment is None else float(sentiment["score"]),
+        "phrase_similarity": context.get("phrase_similarity", float("nan")),
+        "knn_similarity": context.get("knn_similarity", float("nan")),
+        "keyword_hits": keyword_hits,
+        "url_verdict": _verdict(context["url_flags"]),
+        "wallet_verdict": _verdict(context["wallet_flags"]),
+    }
+
+
+def analyze_message(message_text, sentiment=None, message_embedding=None, url_flags=None, wallet_flags=None,
+                    keyword_flag=None, details=None, skip_stages=(), lang=None, prefilter_score=None):
+    """
+    Scores a message and returns `(risk_score, flags, explanations)`.
+
+    `sentiment` and `message_embedding` may be supplied when they were already
+    computed in a batch by the inference queue, and `url_flags`/`wallet_flags`/
+    `keyword_flag` when they were already checked, and `lang` when the
+    language was detected in a batch. In multilingual mode non-English
+    messages are scored with the multilingual models, and precomputed
+    sentiment/embeddings must come from those models. English messages
+    cleared by the pre-filter (`prefilter_score` may be supplied when scored
+    in a batch) skip the transformer stages. Stages stop running once the
+    alert decision is settled; pass a dict as `details` to receive
+    the names of the skipped stages, the message embedding, if computed
+    (English model only; None for other languages), and the raw features
+    of the stages that ran.
+    """
+    if lang is None:
+        with _Stage("language"):
+            lang = detect_languages([message_text])[0]
+    supported = lang == "en" or MULTILINGUAL
+    if lang == "en" and prefilter_score is None and sentiment is None:
+        prefilter_score = prefilter_scores([message_text])[0]
+    if lang == "en" and prefilter_clears(prefilter_score):
+        skip_stages = tuple(skip_stages) + MODEL_STAGES
+    if not supported:
+        scam_risk, flags, skipped = 0.0, ["Unsupported Language"], [stage.name for stage in SCORING_STAGES]
+    else:
+        context = {
+            "text": message_text,
+            "sentiment": sentiment,
+            "embedding": message_embedding,
+            "url_flags": url_flags,
+            "wallet_flags": wallet_flags,
+            "keyword_flag": keyword_flag,
+            "models": ENGLISH_MODELS if lang == "en" else MULTILINGUAL_MODELS,
+        }
+        # The English keywords rarely match other languages, so those
+        # messages always reach the multilingual models unless they alert.
+        score = scorer.score if lang == "en" else scorer.score_all
+        scam_risk, flags, skipped = score(context, skip=skip_stages)
+
+    for stage_name in skipped:
+        stages_skipped.inc(stage=stage_name)
+    if details is not None:
+        details["language"] = lang
+        details["skipped"] = skipped
+        details["embedding"] = context["embedding"] if lang == "en" else None
+        details["prefilter"] = prefilter_score
+        details["features"] = message_features(context) if supported else None
+
+    if not supported:
+        return scam_risk, ", ".join(flags), ["Message language is not supported."]
     explanations = explain_risk_flags(message_text, flags)
 
     return scam_risk, ", ".join(flags), explanations
@@ -199,42 +460,26 @@ def save_to_csv(data, file_path="flagged_messages.csv", headers=None):
 
 ADMIN_CHAT_ID = "your_admin_chat_id_here"
 
-def send_real_time_alert(channel_name, message_text, risk_score, flags):
+def format_alert(channel_name, message_text, risk_score, flags):
     """
-    Sends a real-time alert to the admin with details about the flagged message.
+    Builds the admin alert text for a flagged message.
     """
-    try:
-        explanations = explain_risk_flags(message_text, flags.split(", "))
-        alert_message = (
-            f"🚨 *High-Risk Message Detected* 🚨\n"
-            f"Channel: {channel_name}\n"
-            f"Message: {message_text}\n"
-            f"Risk Score: {risk_score}\n"
-            f"Flags: {flags}\n"
-            f"Explanation: {', '.join(explanations)}"
-        )
-                
-        with open('config.json', 'r') as config_file:
-            config = json.load(config_file)
-            ADMIN_CHAT_ID = config.get("ADMIN_CHAT_ID", "your_admin_chat_id_here")
-
-        payload = {
-            "chat_id": ADMIN_CHAT_ID,
-            "text": alert_message,
-            "parse_mode": "Markdown"
-        }
-
-        response = requests.post(TELEGRAM_REPORT_API, json=payload)
-        if response.status_code == 200:
-            print("Real-time alert sent successfully.")
-        else:
-            print(f"Failed to send alert: {response.json()}")
-    except Exception as e:
-        print(f"Error sending real-time alert: {e}")
+    explanations = explain_risk_flags(message_text, flags.split(", "))
+    return (
+        f"🚨 *High-Risk Message Detected* 🚨\n"
+        f"Channel: {channel_name}\n"
+        f"Message: {message_text}\n"
+        f"Risk Score: {risk_score}\n"
+        f"Flags: {flags}\n"
+        f"Explanation: {', '.join(explanations)}"
+    )
 
 
 def fetch_channels_and_save(client, keyword, csv_file="channels.csv"):
     """ Fetch public channels by keyword and save metadata to CSV """
+    # Imported here so importing this module does not load Telethon.
+    from telethon import functions, types
+
     try:
         result = client(functions.contacts.SearchRequest(q=keyword, limit=50))
         channels_data = []
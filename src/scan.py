@@ -0,0 +1,409 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from feature_store import FeatureStore
+
+_MESSAGES_KEY = re.compile(r'"messages"\s*:\s*\[')
+_NAME_KEY = re.compile(r'"name"\s*:\s*("(?:[^"\\]|\\.)*")')
+_WHITESPACE = re.compile(r"[\s,]*")
+_decoder = json.JSONDecoder()
+
+SCAN_COLUMNS = ["channel", "message_id", "date", "text", "language", "risk_score", "alert",
+                "flags", "explanations", "prefilter"]
+
+
+def message_text(text):
+    """
+    Flattens the "text" field of an exported message, which is either a
+    string or a list of strings and formatted entities.
+    """
+    if isinstance(text, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+    return text or ""
+
+
+def read_telegram_export(path, chunk_size=1 << 20):
+    """
+    Yields `(channel, message_id, date, text)` for every text message in a
+    Telegram Desktop JSON export, either a single chat or a full account
+    export with many chats.
+
+    The file is read in chunks and each "messages" array is decoded one
+    message at a time, so memory use does not depend on the export size.
+    The chat name is taken from the last "name" key before each array,
+    which is where Telegram Desktop writes it.
+    """
+    channel = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as export_file:
+        buffer, position, eof, in_array = "", 0, False, False
+        while True:
+            if not in_array:
+                match = _MESSAGES_KEY.search(buffer, position)
+                names = list(_NAME_KEY.finditer(buffer, position, match.start() if match else len(buffer)))
+                if names:
+                    channel = json.loads(names[-1].group(1))
+                if match:
+                    position, in_array = match.end(), True
+                    continue
+                if eof:
+                    return
+                # Keep the tail in case a key is split across chunks.
+                buffer = buffer[max(position, len(buffer) - 4096):]
+                position = 0
+            else:
+                position = _WHITESPACE.match(buffer, position).end()
+                if position < len(buffer) and buffer[position] == "]":
+                    position, in_array = position + 1, False
+                    continue
+                if position < len(buffer):
+                    try:
+                        message, position = _decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    else:
+                        if message.get("type", "message") == "message":
+                            text = message_text(message.get("text"))
+                            if text:
+                                yield channel, message.get("id"), message.get("date"), text
+                        continue
+                elif eof:
+                    return
+                buffer, position = buffer[position:], 0
+            chunk = export_file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+
+def read_csv_export(path):
+    """
+    Yields `(channel, message_id, date, text)` for each row of a CSV dump
+    with a "Message Text" (or "text"/"message") column, such as the flagged
+    message export.
+    """
+    channel = os.path.splitext(os.path.basename(path))[0]
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        for row in csv.DictReader(csv_file):
+            text = row.get("Message Text") or row.get("text") or row.get("message")
+            if text:
+                yield (row.get("Channel Name") or row.get("channel") or channel,
+                       row.get("Message ID") or row.get("id"), row.get("Date") or row.get("date"), text)
+
+
+def read_text_export(path):
+    channel = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as text_file:
+        for line_number, line in enumerate(text_file, 1):
+            if line.strip():
+                yield channel, line_number, None, line.strip()
+
+
+def read_exports(paths):
+    """
+    Streams the messages of all export files in order.
+    """
+    for path in paths:
+        if path.endswith(".json"):
+            yield from read_telegram_export(path)
+        elif path.endswith(".csv"):
+            yield from read_csv_export(path)
+        else:
+            yield from read_text_export(path)
+
+
+def batched(records, batch_size):
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _init_worker(offline, threads):
+    """
+    Runs once in each worker process: limits the inference threads so the
+    workers do not oversubscribe the cores, and loads the models.
+    """
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    import scam_detection
+    from model_registry import registry
+    if offline:
+        scam_detection.REMOTE_REPUTATION = False
+    names = ["prefilter", "sentiment", "embedding", "phrase_store", "scam_index", "blocklist"]
+    if scam_detection.MULTILINGUAL:
+        names += ["multilingual_sentiment", "multilingual_embedding", "multilingual_phrase_store"]
+    for name in names:
+        registry.get(name)
+
+
+def analyze_batch(batch, with_features=False):
+    """
+    Analyzes a batch of `(channel, message_id, date, text)` records and
+    returns `(rows, details)`: one result row per record and, with
+    `with_features`, the analyze_message details carrying its features.
+    Language detection, the pre-filter and the English sentiment and
+    embedding models each run once on the whole batch; analyze_message
+    then scores every message with those results.
+    """
+    from scam_detection import analyze_message, is_alert, prefilter_clears, prefilter_scores
+    from model_registry import registry
+    from multilingual import detect_languages
+
+    texts = [record[3] for record in batch]
+    languages = detect_languages(texts)
+    english = [i for i, lang in enumerate(languages) if lang == "en"]
+    scores = [None] * len(texts)
+    for i, score in zip(english, prefilter_scores([texts[i] for i in english])):
+        scores[i] = score
+
+    sentiments, embeddings = [None] * len(texts), [None] * len(texts)
+    pending = [i for i in english if not prefilter_clears(scores[i])]
+    if pending:
+        pending_texts = [texts[i] for i in pending]
+        # Without a sentiment model analyze_message runs the stage itself
+        # and treats it as not fired.
+        sentiment_model = registry.get("sentiment")
+        if sentiment_model is not None:
+            for i, sentiment in zip(pending, sentiment_model(
+                    pending_texts, batch_size=len(pending_texts), truncation=True)):
+                sentiments[i] = sentiment
+        nlp_model = registry.get("embedding")
+        if nlp_model is not None:
+            for i, embedding in zip(pending, nlp_model.encode(
+                    pending_texts, batch_size=len(pending_texts), convert_to_numpy=True)):
+                embeddings[i] = embedding
+
+    rows, batch_details = [], []
+    for i, (channel, message_id, date, text) in enumerate(batch):
+        details = {}
+        try:
+            risk_score, flags, explanations = analyze_message(
+                text, sentiment=sentiments[i], message_embedding=embeddings[i],
+                lang=languages[i], prefilter_score=scores[i], details=details,
+            )
+        except Exception as e:
+            print(f"Error analyzing message {message_id} from {channel}: {e}")
+            risk_score, flags, explanations = None, "", [f"Analysis failed: {e}"]
+        if with_features and risk_score is not None:
+            batch_details.append((i, {key: details.get(key) for key in ("features", "embedding", "language")}))
+        rows.append((
+            str(channel), None if message_id is None else str(message_id), None if date is None else str(date),
+            text, languages[i],
+            risk_score, risk_score is not None and is_alert(risk_score), flags, " | ".join(explanations),
+            scores[i],
+        ))
+    return rows, batch_details
+
+
+class ParquetPartWriter:
+    """
+    Writes scan results as numbered Parquet files in a directory, which
+    pandas and pyarrow read as one dataset. Each part is complete once
+    written, so a resumed scan only appends new parts.
+    """
+
+    def __init__(self, directory, part_size=100000, next_part=0):
+        self.directory = directory
+        self.part_size = part_size
+        self.next_part = next_part
+        self.rows = []
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, rows):
+        self.rows.extend(rows)
+
+    def full(self):
+        return len(self.rows) >= self.part_size
+
+    def flush(self):
+        """
+        Writes the buffered rows as the next part; returns the part count.
+        """
+        if not self.rows:
+            return self.next_part
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # An explicit schema keeps the parts readable as one dataset, also
+        # when a part's column holds only nulls.
+        schema = pa.schema([
+            ("channel", pa.string()), ("message_id", pa.string()), ("date", pa.string()), ("text", pa.string()),
+            ("language", pa.string()), ("risk_score", pa.float64()), ("alert", pa.bool_()),
+            ("flags", pa.string()), ("explanations", pa.string()), ("prefilter", pa.float64()),
+        ])
+        columns = list(zip(*self.rows))
+        table = pa.table({name: list(values) for name, values in zip(SCAN_COLUMNS, columns)}, schema=schema)
+        path = os.path.join(self.directory, f"part-{self.next_part:05d}.parquet")
+        pq.write_table(table, f"{path}.tmp", compression="zstd")
+        os.replace(f"{path}.tmp", path)
+        self.next_part += 1
+        self.rows = []
+        return self.next_part
+
+
+def load_checkpoint(path, inputs):
+    """
+    Returns the checkpoint of an earlier scan of the same inputs, or a fresh one.
+    """
+    fresh = {"inputs": inputs, "processed": 0, "flagged": 0, "parts": 0, "feature_rows": None, "complete": False}
+    if not path or not os.path.isfile(path):
+        return fresh
+    try:
+        with open(path, "r") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except Exception as e:
+        print(f"Error loading scan checkpoint: {e}")
+        return fresh
+    if checkpoint.get("inputs") != inputs:
+        raise SystemExit(f"Checkpoint {path} belongs to a scan of {checkpoint.get('inputs')}; "
+                         f"use --restart to start over.")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    try:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"Error saving scan checkpoint: {e}")
+
+
+def run_scan(inputs, output, checkpoint_path, workers=None, batch_size=256, part_size=100000,
+             offline=True, flagged_only=False, restart=False, progress_interval=10.0, features=None,
+             checkpoint_interval=60.0):
+    """
+    Scans the export files and writes the results to `output`. Batches are
+    analyzed across `workers` processes, with a bounded number in flight
+    so the reader never runs ahead of the workers. Results are written in
+    input order and the checkpoint records how many messages are safely on
+    disk, so an interrupted scan resumes after the last written part. A
+    part is written when it is full or `checkpoint_interval` seconds after
+    the last one, so sparse `flagged_only` scans checkpoint as well. With
+    `features`, every message's features are appended to that feature store.
+    """
+    inputs = [os.path.abspath(path) for path in inputs]
+    checkpoint = load_checkpoint(None if restart else checkpoint_path, inputs)
+    if restart and os.path.isdir(output):
+        for name in os.listdir(output):
+            if name.startswith("part-") and name.endswith(".parquet"):
+                os.remove(os.path.join(output, name))
+    if checkpoint["complete"]:
+        print(f"Scan already complete: {checkpoint['processed']} messages in {output}.")
+        return checkpoint
+    if checkpoint["processed"]:
+        print(f"Resuming after {checkpoint['processed']} messages.")
+
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    writer = ParquetPartWriter(output, part_size, checkpoint["parts"])
+    feature_store = FeatureStore(features) if features else None
+    feature_rows = []
+    if feature_store is not None:
+        # Rows appended after the last checkpoint are written again.
+        if checkpoint.get("feature_rows") is None:
+            checkpoint["feature_rows"] = feature_store.count
+        feature_store.truncate(checkpoint["feature_rows"])
+    records = islice(read_exports(inputs), checkpoint["processed"], None)
+    processed, flagged = checkpoint["processed"], checkpoint["flagged"]
+    pending_rows = 0
+    started = last_report = last_commit = time.perf_counter()
+    scanned = 0
+
+    def commit():
+        if feature_store is not None:
+            for (channel, _, _, text, _, risk_score, alert, *_), details in feature_rows:
+                feature_store.add(channel, text, details, risk_score, alert)
+            feature_store.flush()
+            feature_rows.clear()
+            checkpoint["feature_rows"] = feature_store.count
+        checkpoint.update(processed=processed + pending_rows, flagged=flagged, parts=writer.flush())
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(offline, threads),
+    )
+    try:
+        in_flight = deque()
+        batches = batched(records, batch_size)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < workers * 2:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                else:
+                    in_flight.append(pool.submit(analyze_batch, batch, feature_store is not None))
+            if not in_flight:
+                break
+            rows, batch_details = in_flight.popleft().result()
+            feature_rows.extend((rows[i], details) for i, details in batch_details)
+            scanned += len(rows)
+            pending_rows += len(rows)
+            alerts = [row for row in rows if row[6]]
+            flagged += len(alerts)
+            writer.add(alerts if flagged_only else rows)
+            now = time.perf_counter()
+            if writer.full() or len(feature_rows) >= part_size or now - last_commit >= checkpoint_interval:
+                commit()
+                processed, pending_rows = processed + pending_rows, 0
+                last_commit = now
+
+            if now - last_report >= progress_interval:
+                print(f"Scanned {processed + pending_rows} messages ({scanned / (now - started):.1f} msg/s), "
+                      f"{flagged} flagged.")
+                last_report = now
+        commit()
+        processed, pending_rows = processed + pending_rows, 0
+        checkpoint["complete"] = True
+        save_checkpoint(checkpoint_path, checkpoint)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {scanned} messages in {elapsed:.1f}s ({scanned / elapsed if elapsed else 0.0:.1f} msg/s); "
+          f"{flagged} flagged in total. Results in {output}.")
+    return checkpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan exported chat histories for scams.")
+    parser.add_argument("inputs", nargs="+", help="Telegram Desktop JSON exports, CSV dumps or .txt files.")
+    parser.add_argument("--output", default="scan_results", help="Directory for the Parquet result files.")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint.json).")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core).")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--part-size", type=int, default=100000, help="Rows per Parquet file.")
+    parser.add_argument("--online", action="store_true",
+                        help="Also query the remote URL and wallet APIs, not only the local blocklist.")
+    parser.add_argument("--flagged-only", action="store_true", help="Only write messages above the alert threshold.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+    parser.add_argument("--features", help="Feature store directory to record every message's features in.")
+    parser.add_argument("--progress-interval", type=float, default=10.0)
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                        help="Seconds between checkpoints when parts fill slowly.")
+    args = parser.parse_args()
+
+    run_scan(
+        args.inputs, args.output, args.checkpoint or f"{args.output.rstrip('/')}.checkpoint.json",
+        workers=args.workers, batch_size=args.batch_size, part_size=args.part_size, offline=not args.online,
+        flagged_only=args.flagged_only, restart=args.restart, progress_interval=args.progress_interval,
+        features=args.features, checkpoint_interval=args.checkpoint_interval,
+    )
@@ -0,0 +1,91 @@
+from collections import namedtuple
+
+ScoringStage = namedtuple("ScoringStage", ["name", "flag", "weight", "cost", "run"])
+
+_EPSILON = 1e-9
+
+
+class _NoTimer:
+    def __init__(self, name):
+        pass
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class CascadeScorer:
+    """
+    Runs scoring stages cheapest first and stops as soon as the outcome is
+    settled: either the score already reached `threshold`, or the weights of
+    the stages left cannot lift it to `threshold` any more. A `threshold` of
+    0 alerts on any fired stage, like the original `risk_score > 0` rule.
+
+    Once a message alerts, stages costing at most `report_cost` still run,
+    so every cheap indicator (keywords, URLs, wallets) is reported and
+    counted in the score; only the expensive model stages are skipped.
+
+    Each stage's `run(context)` returns True when its flag fires. Flags are
+    reported in the order the stages were declared, not the order they ran.
+    """
+
+    def __init__(self, stages, threshold, timer=_NoTimer, report_cost=5):
+        self.stages = list(stages)
+        self.threshold = threshold
+        self.timer = timer
+        self.report_cost = report_cost
+        self._by_cost = sorted(self.stages, key=lambda stage: stage.cost)
+
+    def is_alert(self, score):
+        return score > 0 and score >= self.threshold - _EPSILON
+
+    def is_settled(self, known, prune=True):
+        """
+        Returns True when the stages already decided in `known` (name -> fired)
+        settle the alert decision, so the remaining stages need not run. With
+        `prune` False only an alert settles it.
+        """
+        score = sum(stage.weight for stage in self.stages if known.get(stage.name))
+        remaining = sum(stage.weight for stage in self.stages if stage.name not in known)
+        return self.is_alert(score) or (prune and score + remaining < self.threshold - _EPSILON)
+
+    def score(self, context, skip=()):
+        """
+        Returns `(score, flags, skipped)` where `skipped` lists the names of
+        stages that were not run.
+        """
+        return self._score(context, skip, prune=True)
+
+    def score_all(self, context, skip=()):
+        """
+        Like score(), but never gives up on a message that cannot reach the
+        threshold any more; for messages whose cheap stages are unreliable.
+        """
+        return self._score(context, skip, prune=False)
+
+    def _score(self, context, skip, prune):
+        score = 0.0
+        fired = set()
+        skipped = []
+        remaining = sum(stage.weight for stage in self._by_cost)
+
+        for index, stage in enumerate(self._by_cost):
+            alerted = self.is_alert(score)
+            if (alerted and stage.cost > self.report_cost) or \
+                    (prune and not alerted and score + remaining < self.threshold - _EPSILON):
+                skipped.extend(later.name for later in self._by_cost[index:])
+                break
+            remaining -= stage.weight
+            if stage.name in skip:
+                skipped.append(stage.name)
+                continue
+            with self.timer(stage.name):
+                fired_now = stage.run(context)
+            if fired_now:
+                score += stage.weight
+                fired.add(stage.name)
+
+        flags = [stage.flag for stage in self.stages if stage.name in fired]
+        return round(score, 4), flags, skipped
@@ -0,0 +1,329 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import multiprocessing
+import queue
+import time
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping channels to shards. Removing a shard only
+    moves that shard's channels; every other assignment stays put.
+    """
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self._ring = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "big")
+
+    @property
+    def nodes(self):
+        return sorted({node for _, node in self._ring})
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            bisect.insort(self._ring, (self._hash(f"{node}:{replica}"), node))
+
+    def remove(self, node):
+        self._ring = [entry for entry in self._ring if entry[1] != node]
+
+    def node_for(self, key):
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._ring, (self._hash(key),)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def telegram_client_factory(shard_id, config_path="config.json"):
+    """
+    Builds the Telegram client of one shard. Each shard has its own session
+    file so the shards never share an MTProto connection.
+    """
+    from telethon import TelegramClient
+    with open(config_path, "r") as config_file:
+        config = json.load(config_file)
+    return TelegramClient(
+        f"crypto_scanner_shard{shard_id}",
+        config["telegram_api"]["api_id"],
+        config["telegram_api"]["api_hash"],
+    )
+
+
+def scam_analyzer():
+    """
+    Returns the analysis function used by the shards: the analyze_message
+    result for messages that raise an alert, None for everything else.
+    """
+    from scam_detection import analyze_message, is_alert
+
+    def analyze(message_text):
+        result = analyze_message(message_text)
+        return result if is_alert(result[0]) else None
+
+    return analyze
+
+
+def run_shard(shard_id, results, commands, client_factory, analyzer_factory, heartbeat_interval=5.0):
+    """
+    Entry point of a shard process.
+    """
+    try:
+        asyncio.run(_run_shard(shard_id, results, commands, client_factory, analyzer_factory, heartbeat_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _run_shard(shard_id, results, commands, client_factory, analyzer_factory, heartbeat_interval):
+    from telethon import events
+
+    client = client_factory(shard_id)
+    analyze = analyzer_factory()
+    loop = asyncio.get_running_loop()
+    channels = set()
+    processed = 0
+
+    async def on_message(event):
+        nonlocal processed
+        message = event.message
+        text = message.message if message and getattr(message, "message", None) else ""
+        if not text:
+            return
+        try:
+            result = await loop.run_in_executor(None, analyze, text)
+        except Exception as e:
+            print(f"Error analyzing message in shard {shard_id}: {e}")
+            return
+        processed += 1
+        if result is not None:
+            channel_name = getattr(event.chat, "title", None) or str(event.chat_id)
+            results.put(("flagged", shard_id, channel_name, text, *result))
+
+    async def resolve(entries):
+        peer_ids = set()
+        for entry in entries:
+            try:
+                peer_ids.add(await client.get_peer_id(entry))
+            except Exception as e:
+                print(f"Error resolving channel {entry} in shard {shard_id}: {e}")
+        return peer_ids
+
+    async def follow_commands():
+        while True:
+            try:
+                command, payload = await loop.run_in_executor(None, commands.get, True, heartbeat_interval)
+            except queue.Empty:
+                command, payload = None, None
+            results.put(("heartbeat", shard_id, processed))
+            if command == "assign":
+                resolved = await resolve(payload)
+                channels.clear()
+                channels.update(resolved)
+                print(f"Shard {shard_id} now monitors {len(channels)} channels.")
+            elif command == "stop":
+                await client.disconnect()
+                return
+
+    # The filter reads the live channel set, so reassignments take effect
+    # without re-registering the handler.
+    client.add_event_handler(on_message, events.NewMessage(func=lambda event: event.chat_id in channels))
+    # A spawned worker cannot prompt for a login code, so it never calls
+    # client.start(); the coordinator checks the sessions before spawning.
+    await client.connect()
+    if not await client.is_user_authorized():
+        print(f"Shard {shard_id} session is not logged in, stopping.")
+        await client.disconnect()
+        return
+    commands_task = asyncio.create_task(follow_commands())
+    try:
+        await client.run_until_disconnected()
+    finally:
+        commands_task.cancel()
+
+
+class ShardCoordinator:
+    """
+    Spreads the monitored channels over `shards` worker processes, each with
+    its own Telegram session and event loop.
+
+    Channels are assigned by consistent hashing. Workers report flagged
+    messages and heartbeats over a shared multiprocessing queue; a shard
+    whose process exits or stops sending heartbeats for `heartbeat_timeout`
+    seconds is dropped and its channels are rebalanced onto the survivors.
+    `client_factory(shard_id)` and `analyzer_factory()` must be picklable
+    (module-level functions) because the workers are spawned.
+    """
+
+    def __init__(self, channels, shards=2, on_flagged=None, client_factory=telegram_client_factory,
+                 analyzer_factory=scam_analyzer, heartbeat_interval=5.0, heartbeat_timeout=30.0, replicas=64):
+        self.channels = list(channels)
+        self.on_flagged = on_flagged
+        self.client_factory = client_factory
+        self.analyzer_factory = analyzer_factory
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ring = HashRing(range(shards), replicas)
+        self._context = multiprocessing.get_context("spawn")
+        self.results = self._context.Queue()
+        self._shards = {}
+        self.flagged = 0
+        self.rebalances = 0
+
+    def assignments(self):
+        """
+        Returns {shard_id: [channels]} for the live shards.
+        """
+        assignments = {shard_id: [] for shard_id in self.ring.nodes}
+        if not assignments:
+            return assignments
+        for channel in self.channels:
+            assignments[self.ring.node_for(channel)].append(channel)
+        return assignments
+
+    async def check_authorized(self):
+        """
+        Raises RuntimeError naming the shards whose session is not logged in.
+        The workers run without a terminal, so they cannot log in themselves.
+        """
+        missing = []
+        for shard_id in self.ring.nodes:
+            client = self.client_factory(shard_id)
+            try:
+                await client.connect()
+                if not await client.is_user_authorized():
+                    missing.append(shard_id)
+            finally:
+                await client.disconnect()
+        if missing:
+            raise RuntimeError(
+                f"Shards {', '.join(map(str, missing))} have no logged-in session. "
+                f"Log them in with `python src/sharding.py login --shards {len(self.ring.nodes)}`."
+            )
+
+    def start(self):
+        for shard_id, channels in self.assignments().items():
+            commands = self._context.Queue()
+            process = self._context.Process(
+                target=run_shard,
+                args=(shard_id, self.results, commands, self.client_factory,
+                      self.analyzer_factory, self.heartbeat_interval),
+                name=f"scanner-shard-{shard_id}",
+                daemon=True,
+            )
+            process.start()
+            commands.put(("assign", channels))
+            self._shards[shard_id] = {
+                "process": process,
+                "commands": commands,
+                "last_heartbeat": time.monotonic(),
+                "processed": 0,
+            }
+        print(f"Started {len(self._shards)} shards for {len(self.channels)} channels.")
+
+    def check_shards(self):
+        """
+        Drops dead or silent shards and pushes the new assignments to the
+        remaining ones. Returns the ids of the dropped shards.
+        """
+        now = time.monotonic()
+        dead = [
+            shard_id for shard_id, shard in self._shards.items()
+            if not shard["process"].is_alive() or now - shard["last_heartbeat"] > self.heartbeat_timeout
+        ]
+        if not dead:
+            return dead
+        for shard_id in dead:
+            shard = self._shards.pop(shard_id)
+            if shard["process"].is_alive():
+                shard["process"].terminate()
+            self.ring.remove(shard_id)
+            print(f"Shard {shard_id} is down, rebalancing its channels.")
+        if self._shards:
+            for shard_id, channels in self.assignments().items():
+                self._shards[shard_id]["commands"].put(("assign", channels))
+            self.rebalances += 1
+        return dead
+
+    def _drain(self, timeout):
+        messages = []
+        try:
+            messages.append(self.results.get(timeout=timeout))
+            while True:
+                messages.append(self.results.get_nowait())
+        except queue.Empty:
+            pass
+        return messages
+
+    def handle(self, messages):
+        for kind, shard_id, *payload in messages:
+            shard = self._shards.get(shard_id)
+            if shard is not None:
+                shard["last_heartbeat"] = time.monotonic()
+            if kind == "heartbeat":
+                if shard is not None:
+                    shard["processed"] = payload[0]
+            elif kind == "flagged":
+                self.flagged += 1
+                if self.on_flagged is not None:
+                    self.on_flagged(*payload)
+
+    async def run(self):
+        """
+        Starts the shards and delivers their results until every shard is gone.
+        """
+        await self.check_authorized()
+        self.start()
+        loop = asyncio.get_running_loop()
+        while self._shards:
+            self.handle(await loop.run_in_executor(None, self._drain, 1.0))
+            self.check_shards()
+        print("All shards are down.")
+
+    def stop(self, timeout=10):
+        for shard in self._shards.values():
+            shard["commands"].put(("stop", None))
+        for shard in self._shards.values():
+            shard["process"].join(timeout)
+            if shard["process"].is_alive():
+                shard["process"].terminate()
+        self._shards.clear()
+
+    def stats(self):
+        return {
+            "shards": {
+                shard_id: {"alive": shard["process"].is_alive(), "processed": shard["processed"]}
+                for shard_id, shard in self._shards.items()
+            },
+            "flagged": self.flagged,
+            "rebalances": self.rebalances,
+        }
+
+
+async def login_shards(shards, client_factory=telegram_client_factory):
+    """
+    Logs in the session of every shard interactively, once before the first
+    sharded run.
+    """
+    for shard_id in range(shards):
+        client = client_factory(shard_id)
+        print(f"Logging in shard {shard_id}...")
+        await client.start()
+        await client.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded deployment tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    login_parser = subparsers.add_parser("login", help="Log in the Telegram session of every shard.")
+    login_parser.add_argument("--shards", type=int, required=True)
+    args = parser.parse_args()
+
+    if args.command == "login":
+        asyncio.run(login_shards(args.shards))
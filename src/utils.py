@@ -1,12 +1,8 @@
 import re
 import requests
-import easyocr
 from langid import classify  
-from googletrans import Translator
-from sentence_transformers import util
 from telethon import functions, types
-
-ocr_reader = easyocr.Reader(['en'])
+from model_registry import registry
 
 
 def is_valid_url(url):
@@ -38,7 +34,7 @@ def extract_text_from_image(image_data):
     Extracts text from an image using EasyOCR.
     """
     try:        
-        result = ocr_reader.readtext(image_data)
+        result = registry.get("ocr").readtext(image_data)
         extracted_text = ' '.join([item[1] for item in result])  
         return extracted_text
     except Exception as e:
@@ -51,7 +47,7 @@ def translate_to_english(text, translator=None):
     Translates a given text to English using Google Translate.
     """
     try:
-        translator = translator or Translator()
+        translator = translator or registry.get("translator")
         lang, _ = classify(text)
         if lang != "en":
             translated = translator.translate(text, src=lang, dest="en")
@@ -67,6 +63,7 @@ def calculate_semantic_similarity(text1, text2, model):
     Calculates the semantic similarity between two texts using a transformer model.
     """
     try:
+        from sentence_transformers import util
         embedding1 = model.encode(text1, convert_to_tensor=True)
         embedding2 = model.encode(text2, convert_to_tensor=True)
         similarity = util.cos_sim(embedding1, embedding2).item()
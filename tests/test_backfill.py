@@ -0,0 +1,110 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from backfill import BackfillScheduler
+
+
+class FakeClient:
+    """
+    Answers GetHistoryRequest from an in-memory channel history, newest
+    first, like Telegram: ids below `offset_id` (any when 0) and above
+    `min_id`.
+    """
+
+    def __init__(self, message_ids):
+        self.message_ids = sorted(message_ids, reverse=True)
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        ids = [i for i in self.message_ids
+               if (not request.offset_id or i < request.offset_id) and i > request.min_id]
+        return SimpleNamespace(messages=[SimpleNamespace(id=i, message=f"message {i}") for i in ids[:request.limit]])
+
+
+def make_scheduler(client, tmp_path, **kwargs):
+    handled = []
+
+    async def handle_messages(channel_id, messages):
+        handled.extend(m.id for m in messages)
+
+    scheduler = BackfillScheduler(client, handle_messages, checkpoint_path=str(tmp_path / "checkpoint.json"),
+                                  **kwargs)
+    return scheduler, handled
+
+
+def test_first_run_reads_newest_messages(tmp_path):
+    client = FakeClient(range(1, 51))
+    scheduler, handled = make_scheduler(client, tmp_path, page_size=10, max_messages=25)
+
+    assert asyncio.run(scheduler.run([7])) == 25
+    assert handled == list(range(50, 25, -1))
+    with open(tmp_path / "checkpoint.json") as checkpoint_file:
+        assert json.load(checkpoint_file) == {"7": {"newest": 50, "gaps": []}}
+
+
+def test_restart_reads_only_new_messages(tmp_path):
+    client = FakeClient(range(1, 31))
+    scheduler, _ = make_scheduler(client, tmp_path, page_size=10, max_messages=100)
+    asyncio.run(scheduler.run([7]))
+
+    client.message_ids = sorted(range(1, 36), reverse=True)
+    scheduler, handled = make_scheduler(client, tmp_path, page_size=10, max_messages=100)
+    assert asyncio.run(scheduler.run([7])) == 5
+    assert handled == [35, 34, 33, 32, 31]
+
+
+def test_capped_run_leaves_a_gap_that_later_runs_fill(tmp_path):
+    client = FakeClient(range(1, 11))
+    scheduler, _ = make_scheduler(client, tmp_path, page_size=4, max_messages=10)
+    asyncio.run(scheduler.run([7]))
+
+    client.message_ids = sorted(range(1, 31), reverse=True)
+    scheduler, handled = make_scheduler(client, tmp_path, page_size=4, max_messages=10)
+    asyncio.run(scheduler.run([7]))
+    assert handled == list(range(30, 20, -1))
+    assert scheduler.checkpoints["7"] == {"newest": 30, "gaps": [[10, 21]]}
+
+    client.message_ids = sorted(range(1, 34), reverse=True)
+    scheduler, handled = make_scheduler(client, tmp_path, page_size=4, max_messages=10)
+    asyncio.run(scheduler.run([7]))
+    # The new messages first, then the oldest unread ones.
+    assert handled == [33, 32, 31] + list(range(20, 13, -1))
+    assert scheduler.checkpoints["7"] == {"newest": 33, "gaps": [[10, 14]]}
+
+    scheduler, handled = make_scheduler(client, tmp_path, page_size=4, max_messages=10)
+    asyncio.run(scheduler.run([7]))
+    assert handled == [13, 12, 11]
+    assert scheduler.checkpoints["7"] == {"newest": 33, "gaps": []}
+
+
+def test_old_checkpoint_format_is_read(tmp_path):
+    with open(tmp_path / "checkpoint.json", "w") as checkpoint_file:
+        json.dump({"7": 20}, checkpoint_file)
+    client = FakeClient(range(1, 26))
+    scheduler, handled = make_scheduler(client, tmp_path, page_size=10, max_messages=100)
+    asyncio.run(scheduler.run([7]))
+    assert handled == [25, 24, 23, 22, 21]
+
+
+def test_concurrency_limit(tmp_path):
+    active = 0
+    max_active = 0
+
+    class SlowClient(FakeClient):
+        async def __call__(self, request):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return await super().__call__(request)
+
+    scheduler, _ = make_scheduler(SlowClient(range(1, 6)), tmp_path, concurrency=2)
+    assert asyncio.run(scheduler.run(list(range(6)))) == 30
+    assert max_active <= 2
@@ -0,0 +1,106 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from image_analysis import ImageAnalyzer
+
+
+def dhash(image, hash_size=8):
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    return (pixels[:, 1:] > pixels[:, :-1]).flatten().tobytes()
+
+
+def screenshot(marks):
+    """
+    A white screenshot with a few dark "glyphs" at the given x offsets of
+    one text line: same layout, different text.
+    """
+    pixels = np.full((600, 800), 255, dtype=np.uint8)
+    for x in marks:
+        pixels[100:110, x:x + 6] = 0
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeReader:
+    """
+    OCR stand-in that "reads" the dark pixel columns of the image.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def readtext(self, pixels):
+        self.calls += 1
+        columns = np.flatnonzero((pixels.min(axis=2) < 128).any(axis=0))
+        return [(None, f"glyphs at {columns[::6].tolist()}", 1.0)]
+
+
+class FakeModels:
+    def __init__(self, reader):
+        self.reader = reader
+
+    def get(self, name):
+        return self.reader
+
+
+class FakeClient:
+    async def download_media(self, message, file=None):
+        return message
+
+
+def test_images_sharing_a_dhash_are_read_separately():
+    benign, scam = screenshot([20, 30, 40]), screenshot([20, 32, 44, 56])
+    assert dhash(Image.open(io.BytesIO(benign))) == dhash(Image.open(io.BytesIO(scam)))
+    reader = FakeReader()
+    analyzer = ImageAnalyzer(models=FakeModels(reader))
+
+    async def read_both():
+        return [await analyzer.extract_text(FakeClient(), data) for data in (benign, scam)]
+
+    try:
+        benign_text, scam_text = asyncio.run(read_both())
+    finally:
+        analyzer.shutdown()
+    assert benign_text != scam_text
+    assert reader.calls == 2
+
+
+def test_identical_images_are_read_once():
+    data = screenshot([20, 30, 40])
+    reader = FakeReader()
+    analyzer = ImageAnalyzer(models=FakeModels(reader))
+
+    async def read_twice():
+        return [await analyzer.extract_text(FakeClient(), data) for _ in range(2)]
+
+    try:
+        first, second = asyncio.run(read_twice())
+    finally:
+        analyzer.shutdown()
+    assert first == second
+    assert reader.calls == 1
+    assert analyzer.stats()["duplicates_skipped"] == 1
+
+
+def test_failed_ocr_is_not_cached():
+    data = screenshot([20])
+    models = FakeModels(None)
+    analyzer = ImageAnalyzer(models=models)
+
+    async def read_twice():
+        first = await analyzer.extract_text(FakeClient(), data)
+        models.reader = FakeReader()
+        return first, await analyzer.extract_text(FakeClient(), data)
+
+    try:
+        first, second = asyncio.run(read_twice())
+    finally:
+        analyzer.shutdown()
+    assert first is None
+    assert second is not None
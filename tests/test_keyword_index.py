@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("rapidfuzz")
+
+from keyword_index import KeywordIndex
+
+KEYWORDS = ["guaranteed profit", "no risk", "double your money"]
+
+
+def keywords_found(text):
+    return [match.keyword for match in KeywordIndex(KEYWORDS).find(text)]
+
+
+def test_exact_keyword_is_found():
+    assert keywords_found("This is a Guaranteed Profit offer") == ["guaranteed profit"]
+
+
+def test_hyphenated_keyword_is_found():
+    assert keywords_found("No-risk trade, join now") == ["no risk"]
+
+
+def test_joined_keyword_is_found():
+    assert keywords_found("100% guaranteedprofit every day") == ["guaranteed profit"]
+
+
+def test_benign_message_is_not_matched():
+    assert keywords_found("The weather is nice today") == []
+    assert keywords_found("profit") == []
+
+
+def test_positions_refer_to_the_original_text():
+    text = "İİİ guaranteed profit"
+    (match,) = KeywordIndex(KEYWORDS).find(text)
+    assert (match.start, match.end) == (4, len(text))
+    assert text[match.start:match.end] == "guaranteed profit"
+
+
+def test_fuzzy_positions_refer_to_the_original_text():
+    text = "İİ: double-your-money!"
+    (match,) = KeywordIndex(KEYWORDS).find(text)
+    assert text[match.start:match.end] == "double-your-money"
@@ -0,0 +1,170 @@
+import asyncio
+import time
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from reputation import RateLimiter, ReputationClient, VerdictCache
+
+
+class StubApi:
+    """
+    Stub reputation API that flags every value starting with "bad" and
+    records how many requests it served and how many ran at once.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request):
+        data = await request.json()
+        self.requests.append(data)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        value = data.get("url") or data.get("wallet")
+        flagged = value.startswith("bad")
+        return web.json_response({"is_phishing": flagged, "scam": flagged})
+
+
+async def run_with_client(api, test, **client_kwargs):
+    app = web.Application()
+    app.router.add_post("/url", api.handle)
+    app.router.add_post("/wallet", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    client = ReputationClient(f"http://127.0.0.1:{port}/url", f"http://127.0.0.1:{port}/wallet",
+                              url_rate=0, wallet_rate=0, **client_kwargs)
+    try:
+        await client.start()
+        return await test(client)
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_verdicts_and_cache_hit():
+    api = StubApi()
+
+    async def test(client):
+        assert await client.check_url("bad.example") is True
+        assert await client.check_url("good.example") is False
+        assert await client.check_url("bad.example") is True
+        return client
+
+    client = asyncio.run(run_with_client(api, test))
+    assert len(api.requests) == 2
+    assert client.cache.hits == 1
+
+
+def test_cache_expiry():
+    api = StubApi()
+
+    async def test(client):
+        await client.check_wallet("bad-wallet")
+        await asyncio.sleep(0.15)
+        await client.check_wallet("bad-wallet")
+
+    asyncio.run(run_with_client(api, test, cache_ttl=0.1))
+    assert len(api.requests) == 2
+
+
+def test_concurrent_lookups_of_one_key_share_a_request():
+    api = StubApi(delay=0.1)
+
+    async def test(client):
+        return await asyncio.gather(*(client.check_url("bad.example") for _ in range(10)))
+
+    assert asyncio.run(run_with_client(api, test)) == [True] * 10
+    assert len(api.requests) == 1
+
+
+def test_connection_limit():
+    api = StubApi(delay=0.05)
+
+    async def test(client):
+        await asyncio.gather(*(client.check_url(f"good{i}.example") for i in range(12)))
+
+    asyncio.run(run_with_client(api, test, max_connections=3))
+    assert len(api.requests) == 12
+    assert api.max_active <= 3
+
+
+def test_timeout_counts_as_no_verdict():
+    api = StubApi(delay=1.0)
+
+    async def test(client):
+        return await client.check_url("bad.example"), client
+
+    flagged, client = asyncio.run(run_with_client(api, test, url_timeout=0.1))
+    assert flagged is False
+    assert client.errors == 1
+    assert client.cache.get("url:bad.example") is None
+
+
+def test_cancelled_lookup_releases_waiters():
+    api = StubApi(delay=0.5)
+
+    async def test(client):
+        owner = asyncio.ensure_future(client.check_url("bad.example"))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(client.check_url("bad.example"))
+        await asyncio.sleep(0.05)
+        owner.cancel()
+        return await asyncio.wait_for(waiter, 1.0), client
+
+    flagged, client = asyncio.run(run_with_client(api, test))
+    assert flagged is False
+    assert not client._pending
+
+
+def test_rate_limiter_spaces_requests():
+    async def acquire_all(limiter, count):
+        started = time.monotonic()
+        for _ in range(count):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    # The first `burst` requests pass at once, the rest at `rate` per second.
+    elapsed = asyncio.run(acquire_all(RateLimiter(rate=20, burst=1), 5))
+    assert 0.18 <= elapsed < 0.5
+
+
+def test_verdict_cache_persists_batched_commits(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+    cache = VerdictCache(path=path, commit_interval=60, commit_batch=1000)
+    cache.set("url:bad.example", True)
+    cache.close()
+    assert VerdictCache(path=path).get("url:bad.example") is True
+
+
+def test_blocklist_callable_is_looked_up_per_check():
+    api = StubApi()
+    blocklists = [None]
+
+    class Blocklist:
+        def check_url(self, url):
+            return url == "listed.example"
+
+        def check_wallet(self, wallet):
+            return False
+
+    async def test(client):
+        before = await client.check_url("listed.example")
+        blocklists[0] = Blocklist()
+        after = await client.check_url("listed.example")
+        return before, after, client
+
+    before, after, client = asyncio.run(run_with_client(api, test, blocklist=lambda: blocklists[0]))
+    assert (before, after) == (False, True)
+    assert client.blocklist_hits == 1
@@ -0,0 +1,159 @@
+import asyncio
+import queue
+import time
+
+import pytest
+
+from sharding import HashRing, ShardCoordinator
+
+
+class FakeShardClient:
+    """
+    Stand-in for a shard's TelegramClient. Shards listed in
+    `LOGGED_OUT` have no session. Once connected it delivers one message
+    per channel id in `CHANNELS`, through the handler's event filter.
+    """
+
+    LOGGED_OUT = set()
+    CHANNELS = (-1001, -1002, -1003, -1004)
+
+    def __init__(self, shard_id):
+        self.shard_id = shard_id
+        self.handlers = []
+        self.connected = False
+
+    async def connect(self):
+        self.connected = True
+
+    async def is_user_authorized(self):
+        return self.shard_id not in self.LOGGED_OUT
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def start(self):
+        raise AssertionError("shards must not log in interactively")
+
+    async def get_peer_id(self, entry):
+        return int(entry)
+
+    def add_event_handler(self, handler, builder):
+        self.handlers.append((handler, builder))
+
+    async def run_until_disconnected(self):
+        delivered = set()
+        while self.connected:
+            for chat_id in self.CHANNELS:
+                event = FakeEvent(chat_id, f"guaranteed profit from {chat_id}")
+                for handler, builder in self.handlers:
+                    if chat_id not in delivered and builder.func(event):
+                        delivered.add(chat_id)
+                        await handler(event)
+            await asyncio.sleep(0.01)
+
+
+class FakeEvent:
+    def __init__(self, chat_id, text):
+        self.chat_id = chat_id
+        self.chat = type("Chat", (), {"title": f"channel {chat_id}"})()
+        self.message = type("Message", (), {"message": text})()
+
+
+def fake_client_factory(shard_id):
+    return FakeShardClient(shard_id)
+
+
+def flag_everything():
+    return lambda text: (0.3, "Keyword Match", ["Message contains keywords commonly used in scams."])
+
+
+class FakeProcess:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.terminated = False
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.alive = False
+        self.terminated = True
+
+
+def coordinator_with_fake_shards(channels, shards, **kwargs):
+    coordinator = ShardCoordinator(channels, shards=shards, client_factory=fake_client_factory, **kwargs)
+    for shard_id in range(shards):
+        coordinator._shards[shard_id] = {
+            "process": FakeProcess(),
+            "commands": queue.Queue(),
+            "last_heartbeat": time.monotonic(),
+            "processed": 0,
+        }
+    return coordinator
+
+
+def test_removing_a_shard_only_moves_its_channels():
+    ring = HashRing(range(4))
+    before = {channel: ring.node_for(channel) for channel in range(1000)}
+    ring.remove(2)
+    for channel, shard_id in before.items():
+        if shard_id != 2:
+            assert ring.node_for(channel) == shard_id
+        else:
+            assert ring.node_for(channel) in (0, 1, 3)
+
+
+def test_logged_out_sessions_fail_before_spawning(monkeypatch):
+    monkeypatch.setattr(FakeShardClient, "LOGGED_OUT", {1})
+    coordinator = ShardCoordinator([-1001], shards=3, client_factory=fake_client_factory)
+    with pytest.raises(RuntimeError, match="Shards 1 have no logged-in session"):
+        asyncio.run(coordinator.run())
+    assert not coordinator._shards
+
+
+def test_results_are_delivered_and_heartbeats_recorded():
+    flagged = []
+    coordinator = coordinator_with_fake_shards([-1001], 2, on_flagged=lambda *payload: flagged.append(payload))
+    coordinator.handle([
+        ("heartbeat", 0, 5),
+        ("flagged", 1, "channel", "text", 0.3, "Keyword Match", []),
+    ])
+    assert coordinator._shards[0]["processed"] == 5
+    assert flagged == [("channel", "text", 0.3, "Keyword Match", [])]
+    assert coordinator.flagged == 1
+
+
+def test_dead_and_silent_shards_are_dropped_and_rebalanced():
+    channels = list(range(-1100, -1000))
+    coordinator = coordinator_with_fake_shards(channels, 3, heartbeat_timeout=30.0)
+    coordinator._shards[0]["process"].alive = False
+    coordinator._shards[1]["last_heartbeat"] -= 60
+    silent = coordinator._shards[1]["process"]
+
+    assert sorted(coordinator.check_shards()) == [0, 1]
+    assert silent.terminated
+    command, assigned = coordinator._shards[2]["commands"].get_nowait()
+    assert command == "assign" and sorted(assigned) == sorted(channels)
+    assert coordinator.rebalances == 1
+
+
+def test_spawned_shards_report_flagged_messages():
+    pytest.importorskip("telethon")
+    flagged = []
+    coordinator = ShardCoordinator(list(FakeShardClient.CHANNELS), shards=2, client_factory=fake_client_factory,
+                                   analyzer_factory=flag_everything, heartbeat_interval=0.1,
+                                   on_flagged=lambda *payload: flagged.append(payload))
+
+    async def run_until_flagged():
+        await coordinator.check_authorized()
+        coordinator.start()
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + 60
+        while len(flagged) < len(FakeShardClient.CHANNELS) and time.monotonic() < deadline:
+            coordinator.handle(await loop.run_in_executor(None, coordinator._drain, 0.1))
+
+    try:
+        asyncio.run(run_until_flagged())
+    finally:
+        coordinator.stop()
+    assert sorted(channel for channel, *_ in flagged) == sorted(f"channel {c}" for c in FakeShardClient.CHANNELS)